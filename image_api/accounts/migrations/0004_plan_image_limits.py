@@ -0,0 +1,31 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0003_plan_can_generate_expiring_links"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="plan",
+            name="max_image_pixels",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="Largest width x height uploaded or rendered. Defaults to IMAGE_MAX_PIXELS.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="plan",
+            name="max_image_size",
+            field=models.PositiveBigIntegerField(
+                blank=True,
+                help_text="Largest upload in bytes. Defaults to IMAGE_MAX_SIZE.",
+                null=True,
+            ),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from common.mixins import TimestampedModel
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -7,12 +8,31 @@ class Plan(TimestampedModel):
     name = models.CharField(max_length=40)
     presets = models.ManyToManyField("images.ImagePreset", related_name="plans")
     can_generate_expiring_links = models.BooleanField(default=False)
+    max_image_pixels = models.PositiveBigIntegerField(
+        blank=True,
+        null=True,
+        help_text="Largest width x height uploaded or rendered. "
+        "Defaults to IMAGE_MAX_PIXELS.",
+    )
+    max_image_size = models.PositiveBigIntegerField(
+        blank=True,
+        null=True,
+        help_text="Largest upload in bytes. Defaults to IMAGE_MAX_SIZE.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    @property
+    def image_max_pixels(self):
+        return self.max_image_pixels or settings.IMAGE_MAX_PIXELS
+
+    @property
+    def image_max_size(self):
+        return self.max_image_size or settings.IMAGE_MAX_SIZE
+
 
 class User(AbstractUser, TimestampedModel):
     plan = models.ForeignKey(
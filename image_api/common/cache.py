@@ -0,0 +1,161 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.serializers.base import BaseSerializer
+
+
+class BytesSerializer(BaseSerializer):
+    """Store bytes as-is instead of pickling them.
+
+    Meant for caches that only hold already encoded payloads such as
+    rendered images.
+    """
+
+    def dumps(self, value):
+        if not isinstance(value, (bytes, bytearray, memoryview)):
+            raise TypeError(f"Expected bytes, got {type(value).__name__}")
+        return bytes(value)
+
+    def loads(self, value):
+        return value
+
+
+class LocalCache:
+    """Thread-safe LRU of a process, bounded by the total size of its values.
+
+    Sizes are ``len()`` of bytes values and the pickled size of others.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        if isinstance(value, (bytes, bytearray)):
+            size = len(value)
+        else:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if size > self.max_size or timeout <= 0:
+                return
+            self.entries[key] = (value, size, time.monotonic() + timeout)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                if key in self.entries:
+                    self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "evictions": self.evictions,
+            }
+
+
+class TieredCache:
+    """A ``LocalCache`` in front of a Django cache.
+
+    The local tier holds entries for at most ``LOCAL_CACHE_TIMEOUT`` seconds,
+    since changes made by other processes only reach the shared cache. It is
+    sized by the ``size_setting`` setting, and skipped when that is 0. Other
+    attributes, e.g. ``lock``, are the shared cache's.
+    """
+
+    def __init__(self, cache, size_setting):
+        self.cache = cache
+        self.size_setting = size_setting
+        self.local = LocalCache(0)
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def _local_enabled(self):
+        self.local.max_size = getattr(settings, self.size_setting)
+        return self.local.max_size > 0
+
+    def get_tiered(self, key):
+        """Return ``(value, tier)``, ``tier`` being "local", "cache" or ``None``."""
+        if self._local_enabled():
+            value = self.local.get(key)
+            if value is not None:
+                return value, "local"
+        value = self.cache.get(key)
+        if value is not None:
+            return value, "cache"
+        return None, None
+
+    def get(self, key, default=None):
+        value, tier = self.get_tiered(key)
+        if tier == "cache":
+            self.set_local(key, value)
+        return default if value is None else value
+
+    def set_local(self, key, value, timeout=None):
+        """Keep ``value`` locally, for at most ``timeout`` seconds if given."""
+        if self._local_enabled():
+            local_timeout = settings.LOCAL_CACHE_TIMEOUT
+            if timeout is not None:
+                local_timeout = min(local_timeout, timeout)
+            self.local.set(key, value, local_timeout)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, local_timeout=None):
+        self.cache.set(key, value, timeout)
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            local_timeout = (
+                timeout if local_timeout is None else min(local_timeout, timeout)
+            )
+        self.set_local(key, value, local_timeout)
+
+    def has_key(self, key):
+        if self._local_enabled() and self.local.get(key) is not None:
+            return True
+        return self.cache.has_key(key)
+
+    def delete(self, key):
+        self.local.delete_many([key])
+        return self.cache.delete(key)
+
+    def delete_many(self, keys):
+        self.local.delete_many(keys)
+        return self.cache.delete_many(keys)
+
+    def clear(self):
+        self.local.clear()
+        return self.cache.clear()
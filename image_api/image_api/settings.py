@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/3.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
+
 import os
 from pathlib import Path
 
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "images.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -141,6 +143,12 @@ AUTH_USER_MODEL = "accounts.User"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Always stream uploads to a temporary file in 64 KiB chunks instead of
+# buffering small ones in memory. With FILE_UPLOAD_TEMP_DIR on the same
+# filesystem as MEDIA_ROOT, storing an upload is a plain rename.
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+FILE_UPLOAD_TEMP_DIR = env("FILE_UPLOAD_TEMP_DIR", default=None)
+
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -156,6 +164,16 @@ REST_FRAMEWORK = {
     },
 }
 
+# Largest images accepted by plans that don't set max_image_pixels or
+# max_image_size. The pixel budget also holds when rendering: JPEGs are
+# measured after being scaled down while decoding, and images that would
+# still decode to more pixels are refused.
+IMAGE_MAX_PIXELS = env.int("IMAGE_MAX_PIXELS", default=50_000_000)
+IMAGE_MAX_SIZE = env.int("IMAGE_MAX_SIZE", default=50 * 1024 * 1024)
+
+# Maximum number of files accepted by one POST /images/bulk/ request.
+BULK_UPLOAD_MAX_FILES = env.int("BULK_UPLOAD_MAX_FILES", default=10000)
+
 REDIS_HOST = env("REDIS_HOST", default="localhost")
 REDIS_PORT = env("REDIS_PORT", default=6379)
 CACHES = {
@@ -170,5 +188,91 @@ CACHES = {
         },
         "KEY_PREFIX": "cache",
         "TIMEOUT": None,
-    }
+    },
+    # Rendered images are already compressed, so they are stored as raw bytes.
+    "renditions": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": f"redis://{REDIS_HOST}:{REDIS_PORT}/2",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "SERIALIZER": "common.cache.BytesSerializer",
+            "COMPRESSOR": "django_redis.compressors.identity.IdentityCompressor",
+            "IGNORE_EXCEPTIONS": True,
+        },
+        "KEY_PREFIX": "rendition",
+        "TIMEOUT": None,
+    },
 }
+
+# Renditions are written once to RENDITION_STORAGE (a storage class path,
+# default_storage when empty). Only renditions up to RENDITION_CACHE_MAX_SIZE
+# bytes are also kept in the cache, so large ones cannot evict thumbnails.
+RENDITION_STORAGE = env("RENDITION_STORAGE", default="")
+RENDITION_CACHE_MAX_SIZE = env.int("RENDITION_CACHE_MAX_SIZE", default=256 * 1024)
+
+# Let the web server send originals and stored renditions: "x-accel-redirect"
+# (nginx, with RENDITION_SENDFILE_URL mapped to an internal location serving
+# MEDIA_ROOT) or "x-sendfile" (Apache/lighttpd). Empty streams from Django.
+RENDITION_SENDFILE = env("RENDITION_SENDFILE", default="")
+RENDITION_SENDFILE_URL = env("RENDITION_SENDFILE_URL", default="/protected-media/")
+
+# Image links are looked up in the default cache for LINK_CACHE_TIMEOUT
+# seconds, and unknown link ids are remembered for LINK_CACHE_MISSING_TIMEOUT.
+LINK_CACHE_TIMEOUT = env.int("LINK_CACHE_TIMEOUT", default=24 * 60 * 60)
+LINK_CACHE_MISSING_TIMEOUT = env.int("LINK_CACHE_MISSING_TIMEOUT", default=60)
+
+# Each process keeps the most recently used renditions and links in memory,
+# in front of Redis, up to these many bytes (0 disables the local tier).
+# Entries live at most LOCAL_CACHE_TIMEOUT seconds, or until their link
+# expires: that is how long a change can take to reach other processes.
+RENDITION_LOCAL_CACHE_SIZE = env.int(
+    "RENDITION_LOCAL_CACHE_SIZE", default=64 * 1024 * 1024
+)
+LINK_LOCAL_CACHE_SIZE = env.int("LINK_LOCAL_CACHE_SIZE", default=8 * 1024 * 1024)
+LOCAL_CACHE_TIMEOUT = env.int("LOCAL_CACHE_TIMEOUT", default=60)
+
+# Renditions are served in the first of these formats the client's Accept
+# header lists (and Pillow can encode), otherwise in the original's format.
+RENDITION_FORMATS = env.list("RENDITION_FORMATS", default=["avif", "webp"])
+
+# Concurrent cache misses for one rendition wait up to RENDITION_LOCK_WAIT
+# seconds for a single render; the lock itself expires after
+# RENDITION_LOCK_TIMEOUT seconds in case its holder dies.
+RENDITION_LOCK_TIMEOUT = env.int("RENDITION_LOCK_TIMEOUT", default=30)
+RENDITION_LOCK_WAIT = env.int("RENDITION_LOCK_WAIT", default=10)
+
+# Originals that fail to decode (truncated or corrupt files) are answered
+# with a 422 without decoding them again for RENDITION_FAILURE_TIMEOUT seconds.
+RENDITION_FAILURE_TIMEOUT = env.int("RENDITION_FAILURE_TIMEOUT", default=60)
+
+# Serve image links from an async view (run under ASGI, see asgi.py).
+IMAGE_URL_VIEW_ASYNC = env.bool("IMAGE_URL_VIEW_ASYNC", default=False)
+
+# Collect request, cache and render metrics, served to Prometheus at /metrics.
+# METRICS_SERVER_TIMING also breaks every response down in a Server-Timing
+# header, which exposes timings to clients.
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+METRICS_SERVER_TIMING = env.bool("METRICS_SERVER_TIMING", default=False)
+
+# Cache misses render on a pool of RENDITION_RENDER_WORKERS ("thread" or
+# "process" RENDITION_RENDER_BACKEND). Up to RENDITION_RENDER_QUEUE_SIZE more
+# renders wait their turn, at most RENDITION_RENDER_USER_QUEUE_SIZE per user,
+# taken round-robin across users. Beyond that links answer 503 with a
+# Retry-After of RENDITION_RENDER_RETRY_AFTER seconds.
+RENDITION_RENDER_BACKEND = env("RENDITION_RENDER_BACKEND", default="thread")
+RENDITION_RENDER_WORKERS = env.int(
+    "RENDITION_RENDER_WORKERS", default=os.cpu_count() or 1
+)
+RENDITION_RENDER_QUEUE_SIZE = env.int("RENDITION_RENDER_QUEUE_SIZE", default=100)
+RENDITION_RENDER_USER_QUEUE_SIZE = env.int(
+    "RENDITION_RENDER_USER_QUEUE_SIZE", default=10
+)
+RENDITION_RENDER_RETRY_AFTER = env.int("RENDITION_RENDER_RETRY_AFTER", default=5)
+
+# Render the preset renditions of an upload once its transaction commits.
+# Backends: "sync" (inline), "thread" (in-process pool) or "process".
+RENDITION_PRERENDER = env.bool("RENDITION_PRERENDER", default=False)
+RENDITION_PRERENDER_BACKEND = env("RENDITION_PRERENDER_BACKEND", default="thread")
+RENDITION_PRERENDER_WORKERS = env.int(
+    "RENDITION_PRERENDER_WORKERS", default=os.cpu_count() or 1
+)
@@ -0,0 +1,30 @@
+"""
+Settings for running the benchmarks without Postgres or Redis:
+
+    DJANGO_SETTINGS_MODULE=image_api.settings_benchmark \
+        python manage.py run_benchmarks --migrate
+"""
+
+import tempfile
+from pathlib import Path
+
+from .settings import *  # noqa: F401,F403
+
+BENCHMARK_DIR = Path(tempfile.gettempdir()) / "image_api_benchmark"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BENCHMARK_DIR / "db.sqlite3",
+    }
+}
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "renditions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "renditions",
+    },
+}
+
+MEDIA_ROOT = BENCHMARK_DIR / "media"
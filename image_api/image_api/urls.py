@@ -3,14 +3,27 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import include, path
-from images.views import ImageUrlView, UploadedImageViewSet
+from images.views import (
+    AsyncImageUrlView,
+    ImageUrlView,
+    UploadedImageViewSet,
+    metrics_view,
+    render_stats,
+)
 from rest_framework import routers
 
 router = routers.DefaultRouter()
 router.register(r"images", UploadedImageViewSet, basename="images")
 
+if settings.IMAGE_URL_VIEW_ASYNC:
+    image_url_view = AsyncImageUrlView.as_view()
+else:
+    image_url_view = ImageUrlView.as_view()
+
 urlpatterns = [
-    path("image/<pk>/", ImageUrlView.as_view(), name="image-url-view"),
+    path("image/<pk>/", image_url_view, name="image-url-view"),
+    path("render-stats/", render_stats, name="render-stats"),
+    path("metrics", metrics_view, name="metrics"),
     path("", include(router.urls)),
     path("api-auth/", include("rest_framework.urls")),
     path("admin/", admin.site.urls),
@@ -0,0 +1,216 @@
+"""Benchmarks of the render, serve, list and upload paths.
+
+Each benchmark returns a result dict with latency percentiles, throughput
+and, where it applies, database queries per request and peak RSS. They run
+against whatever database, cache and storage are configured, on temporary
+fixtures that ``BenchmarkFixtures.cleanup`` removes again.
+"""
+
+import multiprocessing
+import resource
+import statistics
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from accounts.models import Plan, User
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import rendering
+from .models import ImagePreset, ImageUrl, UploadedImage
+from .renditions import delete_renditions
+from .views import ImageUrlView, UploadedImageViewSet
+
+PRESETS = [
+    {"name": "thumbnail", "height": 200},
+    {"name": "medium", "height": 400},
+    {"name": "square", "width": 300, "height": 300, "fit": rendering.FILL},
+    {"name": "original"},
+]
+
+
+def generate_image(size, format):
+    img_data = BytesIO()
+    noise = Image.effect_noise(size, 48)
+    Image.merge("RGB", [noise, noise.transpose(Image.FLIP_LEFT_RIGHT), noise]).save(
+        img_data, format
+    )
+    return img_data.getvalue()
+
+
+def summarize(name, params, latencies, queries=None, peak_rss_kib=None):
+    ordered = sorted(latencies)
+    result = {
+        "name": name,
+        "params": params,
+        "iterations": len(ordered),
+        "latency_ms": {
+            "min": ordered[0] * 1000,
+            "median": statistics.median(ordered) * 1000,
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            "max": ordered[-1] * 1000,
+        },
+        "throughput_per_s": len(ordered) / sum(ordered) if sum(ordered) else None,
+    }
+    if queries is not None:
+        result["queries_per_request"] = sum(queries) / len(queries)
+    result["peak_rss_kib"] = peak_rss_kib or peak_rss()
+    return result
+
+
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def timed(fn, iterations):
+    latencies, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+    return latencies, queries
+
+
+class BenchmarkFixtures:
+    """A throwaway plan, presets, user and images to benchmark against."""
+
+    def __init__(self):
+        suffix = uuid.uuid4().hex
+        pks = [
+            ImagePreset.objects.create(
+                **{**preset, "name": f"{preset['name']}-{suffix}"}
+            ).pk
+            for preset in PRESETS
+        ]
+        # Reload them so dimensions are Decimals and fits plain strings, as in
+        # presets read by the views.
+        self.presets = list(ImagePreset.objects.filter(pk__in=pks).order_by("pk"))
+        self.plan = Plan.objects.create(name=f"benchmark-{suffix}")
+        self.plan.presets.set(self.presets)
+        self.user = User.objects.create_user(
+            username=f"benchmark-{suffix}", plan=self.plan
+        )
+        # Owns only the images of the list benchmark.
+        self.account = User.objects.create_user(
+            username=f"benchmark-{suffix}-account", plan=self.plan
+        )
+
+    def create_image(self, size, format, user=None):
+        return UploadedImage.objects.create(
+            image=ContentFile(generate_image(size, format), name=f"benchmark.{format}"),
+            user=user or self.user,
+        )
+
+    def create_links(self, image):
+        return ImageUrl.objects.bulk_create(
+            [ImageUrl(image=image, preset=preset) for preset in self.presets]
+        )
+
+    def grow_account(self, count, template):
+        """Add ``count`` images sharing the file and metadata of ``template``.
+
+        Every account image without links gets one per preset.
+        """
+        images = []
+        for _ in range(count):
+            image = UploadedImage(user=self.account, image=template.image.name)
+            for field in UploadedImage.METADATA_FIELDS:
+                setattr(image, field, getattr(template, field))
+            images.append(image)
+        UploadedImage.objects.bulk_create(images)
+        images = UploadedImage.objects.filter(user=self.account, imageurl__isnull=True)
+        ImageUrl.objects.bulk_create(
+            [
+                ImageUrl(image=image, preset=preset)
+                for image in images
+                for preset in self.presets
+            ]
+        )
+
+    def cleanup(self):
+        names = set()
+        users = [self.user, self.account]
+        for image in UploadedImage.objects.filter(user__in=users):
+            # Account fixtures share one file, so each is only removed once.
+            if image.image.name in names:
+                continue
+            names.add(image.image.name)
+            for preset in self.presets:
+                delete_renditions(image, preset)
+            image.image.delete(save=False)
+        for user in users:
+            user.delete()
+        self.plan.delete()
+        for preset in self.presets:
+            preset.delete()
+
+
+def benchmark_render(image, presets, iterations):
+    """Decode, resize and encode every preset, in a fresh process.
+
+    Running in a spawned child makes its peak RSS that of the render alone.
+    """
+    specs = {preset.spec for preset in presets if preset.width or preset.height}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        latencies, rss = executor.submit(
+            rendering.time_renders, image.image.path, specs, image.filetype, iterations
+        ).result()
+    return latencies, rss
+
+
+def benchmark_serve(image_url, iterations, miss=False):
+    factory = APIRequestFactory()
+    view = ImageUrlView.as_view()
+
+    def serve():
+        response = view(factory.get("/"), pk=image_url.pk)
+        b"".join(response.streaming_content)
+
+    if not miss:
+        serve()
+        return timed(serve, iterations)
+
+    latencies, queries = [], []
+    for _ in range(iterations):
+        delete_renditions(image_url.image, image_url.preset)
+        [latency], [query_count] = timed(serve, 1)
+        latencies.append(latency)
+        queries.append(query_count)
+    return latencies, queries
+
+
+def benchmark_list(user, iterations, page_size):
+    factory = APIRequestFactory()
+    view = UploadedImageViewSet.as_view({"get": "list"}, throttle_classes=[])
+
+    def list_images():
+        request = factory.get("/images/", {"page_size": page_size})
+        force_authenticate(request, user=user)
+        view(request).render()
+
+    return timed(list_images, iterations)
+
+
+def benchmark_upload(user, content, format, iterations):
+    factory = APIRequestFactory()
+    view = UploadedImageViewSet.as_view({"post": "create"}, throttle_classes=[])
+
+    def upload():
+        file = ContentFile(content, name=f"upload.{format}")
+        request = factory.post("/images/", {"image": file}, format="multipart")
+        force_authenticate(request, user=user)
+        response = view(request)
+        # Like the request handler, close the uploaded temporary files.
+        request.close()
+        if response.status_code != 201:
+            raise RuntimeError(f"Upload failed: {response.data}")
+
+    return timed(upload, iterations)
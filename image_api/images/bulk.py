@@ -0,0 +1,192 @@
+import shutil
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from rest_framework import serializers
+from rest_framework.fields import get_error_detail
+
+from .fields import ImageHeaderField
+from .models import ImageUrl, UploadedImage
+from .prerender import schedule_prerender
+
+
+def spool(stream, name, size, max_size):
+    """Copy ``stream`` into a temporary file that only stays in memory while small.
+
+    Archive members claiming more than ``max_size`` bytes aren't copied, and
+    the copy stops past ``max_size``, as headers can lie: either way the file
+    keeps a size the upload field refuses.
+    """
+    spooled = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    if size <= max_size:
+        try:
+            copy_at_most(stream, spooled, max_size + 1)
+        except BaseException:
+            spooled.close()
+            raise
+        size = spooled.tell()
+    spooled.seek(0)
+    return UploadedFile(spooled, name=PurePosixPath(name).name, size=size)
+
+
+def copy_at_most(source, destination, length):
+    while length > 0:
+        chunk = source.read(min(length, shutil.COPY_BUFSIZE))
+        if not chunk:
+            break
+        destination.write(chunk)
+        length -= len(chunk)
+
+
+# Raised by corrupt or truncated archives, also part way through them.
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, tarfile.TarError)
+
+
+def iter_archive(archive, max_size):
+    """Yield the regular files of a zip or tar archive one at a time.
+
+    Files past ``max_size`` bytes are yielded without their content.
+    """
+    try:
+        yield from _iter_members(archive, max_size)
+    except ARCHIVE_ERRORS:
+        raise serializers.ValidationError(
+            {"archive": ["Upload a valid zip or tar archive."]}
+        )
+
+
+def _iter_members(archive, max_size):
+    if zipfile.is_zipfile(archive):
+        archive.seek(0)
+        with zipfile.ZipFile(archive) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                with zip_file.open(info) as member:
+                    yield spool(member, info.filename, info.file_size, max_size)
+        return
+
+    archive.seek(0)
+    # "r|*" reads the tar as a stream, so it is never loaded whole.
+    with tarfile.open(fileobj=archive, mode="r|*") as tar_file:
+        for member in tar_file:
+            if member.isfile():
+                yield spool(
+                    tar_file.extractfile(member), member.name, member.size, max_size
+                )
+
+
+class BulkUploader:
+    """Validate images one by one and store them in batched inserts."""
+
+    batch_size = 200
+
+    def __init__(self, user, link_serializer, expire=None):
+        self.user = user
+        self.link_serializer = link_serializer
+        self.expire = expire
+        self.presets = list(user.plan.presets.all())
+        self.image_field = ImageHeaderField(
+            max_pixels=user.plan.image_max_pixels, max_size=user.plan.image_max_size
+        )
+        self.results = []
+        self.pending = []
+
+    def add(self, upload):
+        """Validate ``upload`` and queue it for storing.
+
+        Returns ``False`` once the upload holds ``BULK_UPLOAD_MAX_FILES``
+        files: earlier batches may already be stored, so files past the limit
+        are reported as skipped rather than failing the whole request.
+        """
+        if len(self.results) >= settings.BULK_UPLOAD_MAX_FILES:
+            self.add_errors(
+                upload.name,
+                [
+                    "A bulk upload can contain at most "
+                    f"{settings.BULK_UPLOAD_MAX_FILES} files, this one and any "
+                    "after it were skipped."
+                ],
+            )
+            upload.close()
+            return False
+        result = {"name": upload.name}
+        self.results.append(result)
+        try:
+            image = self.image_field.run_validation(upload)
+        except serializers.ValidationError as exc:
+            errors = exc.detail
+        except DjangoValidationError as exc:
+            errors = get_error_detail(exc)
+        else:
+            self.pending.append((result, image))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            return True
+        result["errors"] = errors
+        upload.close()
+        return True
+
+    def add_errors(self, name, errors):
+        self.results.append({"name": name, "errors": errors})
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            self._store([image for _, image in self.pending])
+        finally:
+            for _, image in self.pending:
+                image.close()
+        self.pending = []
+
+    @transaction.atomic
+    def _store(self, files):
+        images = []
+        for file in files:
+            uploaded_image = UploadedImage(user=self.user, image=file)
+            uploaded_image.populate_metadata()
+            uploaded_image.image.save(file.name, file, save=False)
+            images.append(uploaded_image)
+        images = UploadedImage.objects.bulk_create(images)
+        if any(uploaded_image.pk is None for uploaded_image in images):
+            # Not every backend returns primary keys from bulk inserts.
+            ids = dict(
+                UploadedImage.objects.filter(
+                    user=self.user, image__in=[image.image.name for image in images]
+                ).values_list("image", "id")
+            )
+            for uploaded_image in images:
+                uploaded_image.pk = ids[uploaded_image.image.name]
+
+        ImageUrl.objects.bulk_create(
+            [
+                ImageUrl(preset=preset, image=uploaded_image, expire=self.expire)
+                for uploaded_image in images
+                for preset in self.presets
+            ]
+        )
+        prefetch_related_objects(
+            images,
+            Prefetch(
+                "imageurl_set", queryset=ImageUrl.objects.select_related("preset")
+            ),
+        )
+        self._add_results(images)
+        for uploaded_image in images:
+            schedule_prerender(uploaded_image)
+
+    def _add_results(self, images):
+        for (result, _), uploaded_image in zip(self.pending, images):
+            result["id"] = uploaded_image.pk
+            result["image_links"] = self.link_serializer.get_image_links(uploaded_image)
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+
+from django.conf import settings
+
+
+class RenderQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Too many renders are queued.")
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    """Run renders on a pool, queueing the excess fairly between users.
+
+    At most ``workers`` jobs are handed to the pool at a time. The rest wait
+    in one queue per user and are dispatched round-robin across users, so a
+    burst of misses from one account cannot starve the others. ``submit``
+    raises ``RenderQueueFull`` rather than queue more than ``queue_size``
+    jobs, or more than ``user_queue_size`` for a single user.
+    """
+
+    def __init__(self, backend, workers, queue_size, user_queue_size, retry_after):
+        if backend == "thread":
+            self.pool = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="render"
+            )
+        elif backend == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown render backend: {backend}")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.user_queue_size = user_queue_size
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._renders = 0
+        self._render_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    def submit(self, user_id, fn, *args):
+        job = (Future(), fn, args, time.monotonic())
+        with self._lock:
+            if self._running < self.workers and not self._queued:
+                self._running += 1
+            else:
+                queue = self._queues.setdefault(user_id, deque())
+                if (
+                    self._queued >= self.queue_size
+                    or len(queue) >= self.user_queue_size
+                ):
+                    if not queue:
+                        del self._queues[user_id]
+                    raise RenderQueueFull(self.retry_after)
+                queue.append(job)
+                self._queued += 1
+                return job[0]
+        self._dispatch(job)
+        return job[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._queued,
+                "queued_users": len(self._queues),
+                "renders": self._renders,
+                "render_seconds": self._render_seconds,
+                "queue_wait_seconds": self._wait_seconds,
+            }
+
+    def _dispatch(self, job):
+        future, fn, args, queued_at = job
+        started_at = time.monotonic()
+        with self._lock:
+            self._wait_seconds += started_at - queued_at
+        try:
+            pool_future = self.pool.submit(fn, *args)
+        except Exception as exc:
+            pool_future = Future()
+            pool_future.set_exception(exc)
+        pool_future.add_done_callback(partial(self._finished, future, started_at))
+
+    def _finished(self, future, started_at, pool_future):
+        elapsed = time.monotonic() - started_at
+        logging.debug("Rendered in %.3fs", elapsed)
+        with self._lock:
+            self._renders += 1
+            self._render_seconds += elapsed
+            job = self._next_job()
+            if job is None:
+                self._running -= 1
+
+        exception = pool_future.exception()
+        if exception is None:
+            future.set_result(pool_future.result())
+        else:
+            future.set_exception(exception)
+        if job is not None:
+            self._dispatch(job)
+
+    def _next_job(self):
+        if not self._queues:
+            return None
+        user_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(user_id)
+        else:
+            del self._queues[user_id]
+        self._queued -= 1
+        return job
+
+
+@lru_cache(maxsize=None)
+def get_render_executor():
+    return RenderExecutor(
+        backend=settings.RENDITION_RENDER_BACKEND,
+        workers=settings.RENDITION_RENDER_WORKERS,
+        queue_size=settings.RENDITION_RENDER_QUEUE_SIZE,
+        user_queue_size=settings.RENDITION_RENDER_USER_QUEUE_SIZE,
+        retry_after=settings.RENDITION_RENDER_RETRY_AFTER,
+    )
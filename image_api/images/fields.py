@@ -0,0 +1,55 @@
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+from . import rendering
+
+
+class ImageHeaderField(serializers.FileField):
+    """Image upload field that only reads the image header.
+
+    Unlike ``serializers.ImageField`` it does not load and verify the whole
+    image with Pillow. The parsed ``(width, height, format)`` is attached to
+    the file as ``image_header`` for ``UploadedImage`` to store. Images with
+    more than ``max_pixels`` pixels or ``max_size`` bytes are refused.
+    """
+
+    default_error_messages = {
+        "invalid_image": (
+            "Upload a valid image. The file you uploaded was either not an "
+            "image or a corrupted image."
+        ),
+        "too_many_pixels": (
+            "Images can have at most {max_pixels} pixels, this one has {pixels}."
+        ),
+        "too_large": "Images can be at most {max_size}, this one is {size}.",
+        "decompression_bomb": "This image has too many pixels.",
+    }
+
+    def __init__(self, *args, max_pixels=None, max_size=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_pixels = max_pixels
+        self.max_size = max_size
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        if self.max_size and file.size > self.max_size:
+            self.fail(
+                "too_large",
+                max_size=filesizeformat(self.max_size),
+                size=filesizeformat(file.size),
+            )
+        try:
+            file.image_header = rendering.read_header(file)
+        except Image.DecompressionBombError:
+            # Past Pillow's own limit, which guards against images whose
+            # header claims dimensions no plan could afford.
+            self.fail("decompression_bomb")
+        except (UnidentifiedImageError, OSError, ValueError):
+            self.fail("invalid_image")
+        width, height, _ = file.image_header
+        if self.max_pixels and width * height > self.max_pixels:
+            self.fail(
+                "too_many_pixels", max_pixels=self.max_pixels, pixels=width * height
+            )
+        return file
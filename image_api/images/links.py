@@ -0,0 +1,116 @@
+from common.cache import TieredCache
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .models import ImagePreset, ImageUrl, UploadedImage
+
+# Cached for link ids that don't exist, so scrapers probing random ids don't
+# reach the database either.
+MISSING = "missing"
+
+link_cache = TieredCache(cache, "LINK_LOCAL_CACHE_SIZE")
+
+
+# Link entries only hold the link's own row; its image and preset are cached
+# once under their own keys, so editing one invalidates a single entry.
+LINK_FIELDS = ["id", "image_id", "preset_id", "expire", "expires_at"]
+
+
+def link_cache_key(pk):
+    return f"link:{pk}"
+
+
+def related_cache_key(model, pk):
+    return f"link-{model._meta.model_name}:{pk}"
+
+
+def dump_instance(obj, fields=None):
+    return {
+        field.attname: field.get_prep_value(field.value_from_object(obj))
+        for field in obj._meta.concrete_fields
+        if fields is None or field.attname in fields
+    }
+
+
+def load_instance(model, data):
+    # Fields missing from an entry cached before a schema change are deferred
+    # and loaded from the database on access.
+    return model.from_db(None, list(data), list(data.values()))
+
+
+def cache_related(obj):
+    if isinstance(obj, UploadedImage) and not obj.content_hash:
+        # Computing the hash saves the image, which would invalidate it again.
+        return
+    link_cache.set(
+        related_cache_key(type(obj), obj.pk),
+        dump_instance(obj),
+        settings.LINK_CACHE_TIMEOUT,
+    )
+
+
+def lookup_related(model, pk):
+    key = related_cache_key(model, pk)
+    data, tier = link_cache.get_tiered(key)
+    if data is not None:
+        if tier == "cache":
+            link_cache.set_local(key, data)
+        return load_instance(model, data)
+    obj = model.objects.filter(pk=pk).first()
+    if obj is not None:
+        cache_related(obj)
+    return obj
+
+
+def lookup_link(pk):
+    """Return the link ``pk`` with its image and preset, or ``None``.
+
+    Both found and missing links are cached, so repeated lookups don't query
+    the database. Links are kept in the local tier until they expire at most.
+    """
+    key = link_cache_key(pk)
+    data, tier = link_cache.get_tiered(key)
+    metrics.increment("image_link_lookups_total", (("result", tier or "miss"),))
+    if data == MISSING:
+        if tier == "cache":
+            link_cache.set_local(key, data, settings.LINK_CACHE_MISSING_TIMEOUT)
+        return None
+    if data is None:
+        image_url = (
+            ImageUrl.objects.select_related("image", "preset").filter(pk=pk).first()
+        )
+        if image_url is None:
+            link_cache.set(key, MISSING, settings.LINK_CACHE_MISSING_TIMEOUT)
+            return None
+        link_cache.set(
+            key,
+            dump_instance(image_url, LINK_FIELDS),
+            settings.LINK_CACHE_TIMEOUT,
+            local_timeout=image_url.expire_in,
+        )
+        cache_related(image_url.image)
+        cache_related(image_url.preset)
+        return image_url
+
+    image_url = load_instance(ImageUrl, data)
+    if tier == "cache":
+        link_cache.set_local(key, data, image_url.expire_in)
+    image = lookup_related(UploadedImage, image_url.image_id)
+    preset = lookup_related(ImagePreset, image_url.preset_id)
+    if image is None or preset is None:
+        # Deleted since; deleting the link as well invalidates its entry.
+        return None
+    image_url.image = image
+    image_url.preset = preset
+    return image_url
+
+
+def invalidate_links(pks):
+    keys = [link_cache_key(pk) for pk in pks]
+    if keys:
+        link_cache.delete_many(keys)
+
+
+def invalidate_related(obj):
+    link_cache.delete(related_cache_key(type(obj), obj.pk))
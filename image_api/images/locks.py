@@ -0,0 +1,68 @@
+import logging
+import threading
+from contextlib import contextmanager
+from weakref import WeakValueDictionary
+
+from django.conf import settings
+from redis.exceptions import LockError, RedisError
+
+
+class _SharedLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+class LocalLock:
+    """In-process stand-in for a Redis lock; instances with one name share it."""
+
+    _locks = WeakValueDictionary()
+    _guard = threading.Lock()
+
+    def __init__(self, name, blocking_timeout):
+        with self._guard:
+            shared = self._locks.get(name)
+            if shared is None:
+                shared = self._locks[name] = _SharedLock()
+        self._shared = shared
+        self.blocking_timeout = blocking_timeout
+
+    def acquire(self):
+        return self._shared.lock.acquire(timeout=self.blocking_timeout)
+
+    def release(self):
+        self._shared.lock.release()
+
+
+def get_lock(cache, name):
+    if hasattr(cache, "lock"):
+        return cache.lock(
+            name,
+            timeout=settings.RENDITION_LOCK_TIMEOUT,
+            blocking_timeout=settings.RENDITION_LOCK_WAIT,
+        )
+    return LocalLock(name, settings.RENDITION_LOCK_WAIT)
+
+
+@contextmanager
+def single_flight(cache, name):
+    """Hold the lock ``name`` of ``cache`` for the duration of the block.
+
+    Falls back to an in-process lock when the cache has no lock support or
+    Redis is unreachable. Yields whether the lock was acquired; ``False``
+    means the wait timed out and the caller should carry on without it.
+    """
+    lock = get_lock(cache, name)
+    try:
+        acquired = lock.acquire()
+    except RedisError:
+        logging.warning("Falling back to a local lock for %s", name, exc_info=True)
+        lock = LocalLock(name, settings.RENDITION_LOCK_WAIT)
+        acquired = lock.acquire()
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except (LockError, RedisError):
+                logging.warning("Lock %s expired before it was released", name)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from images.models import UploadedImage
+
+
+class Command(BaseCommand):
+    help = "Store dimensions, format, MIME type, hash and size of existing images."
+
+    batch_size = 500
+    fields = ["content_hash", "width", "height", "format", "mime_type", "file_size"]
+
+    def handle(self, *args, **options):
+        images = UploadedImage.objects.filter(
+            Q(content_hash="") | Q(width__isnull=True) | Q(mime_type="")
+        ).order_by("id")
+
+        batch = []
+        updated = failed = 0
+        for uploaded_image in images.iterator(chunk_size=self.batch_size):
+            try:
+                uploaded_image.populate_metadata()
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"Skipping image {uploaded_image.pk}: {exc}")
+                continue
+            finally:
+                uploaded_image.image.close()
+            batch.append(uploaded_image)
+            if len(batch) >= self.batch_size:
+                updated += self.save_batch(batch)
+                batch = []
+        updated += self.save_batch(batch)
+        self.stdout.write(f"Updated {updated} images ({failed} failed).")
+
+    def save_batch(self, batch):
+        UploadedImage.objects.bulk_update(batch, self.fields)
+        return len(batch)
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from accounts.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory
+from images.models import ImagePreset, ImageUrl, UploadedImage
+from images.renditions import get_rendition_storage, rendition_cache
+from images.views import AsyncImageUrlView, ImageUrlView
+from PIL import Image
+
+
+def noise_image(size):
+    img_data = BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(img_data, "jpeg")
+    return img_data.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the sync (WSGI) and async (ASGI) image link "
+        "views for cache hits and misses, using temporary images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--preset", help="Preset name, defaults to the first one.")
+        parser.add_argument("--size", type=int, nargs=2, default=[1600, 1200])
+
+    def handle(self, *args, **options):
+        presets = ImagePreset.objects.exclude(width=None, height=None).order_by("id")
+        if options["preset"]:
+            presets = presets.filter(name=options["preset"])
+        self.preset = presets.first()
+        if self.preset is None:
+            raise CommandError("No preset to render.")
+        self.requests = options["requests"]
+        self.concurrency = options["concurrency"]
+        self.size = tuple(options["size"])
+
+        self.user = User.objects.create_user(username=f"benchmark-{uuid.uuid4().hex}")
+        try:
+            self.stdout.write(
+                f"{'':6} {'scenario':8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}"
+            )
+            for name, run in [("wsgi", self.run_wsgi), ("asgi", self.run_asgi)]:
+                hit_id = self.create_links(1)[0]
+                run([hit_id])
+                self.report(name, "hit", run([hit_id] * self.requests))
+                self.report(name, "miss", run(self.create_links(self.requests)))
+        finally:
+            self.cleanup()
+
+    def create_links(self, count):
+        link_ids = []
+        for _ in range(count):
+            image = UploadedImage.objects.create(
+                image=ContentFile(noise_image(self.size), name="benchmark.jpg"),
+                user=self.user,
+            )
+            link_ids.append(ImageUrl.objects.create(image=image, preset=self.preset).pk)
+        return link_ids
+
+    def run_wsgi(self, link_ids):
+        factory = RequestFactory()
+        view = ImageUrlView.as_view()
+
+        def fetch(pk):
+            try:
+                start = time.perf_counter()
+                response = view(factory.get("/"), pk=pk)
+                b"".join(response.streaming_content)
+                return time.perf_counter() - start
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            latencies = list(executor.map(fetch, link_ids))
+        return time.perf_counter() - start, latencies
+
+    def run_asgi(self, link_ids):
+        factory = AsyncRequestFactory()
+        view = AsyncImageUrlView.as_view()
+
+        async def fetch(semaphore, pk):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await view(factory.get("/"), pk=pk)
+                b"".join(response.streaming_content)
+                return time.perf_counter() - start
+
+        async def run():
+            semaphore = asyncio.Semaphore(self.concurrency)
+            return await asyncio.gather(*(fetch(semaphore, pk) for pk in link_ids))
+
+        start = time.perf_counter()
+        latencies = asyncio.run(run())
+        return time.perf_counter() - start, latencies
+
+    def report(self, name, scenario, result):
+        elapsed, latencies = result
+        p50 = statistics.median(latencies) * 1000
+        p95 = (
+            statistics.quantiles(latencies, n=20)[-1] * 1000
+            if len(latencies) > 1
+            else p50
+        )
+        self.stdout.write(
+            f"{name:6} {scenario:8} {len(latencies) / elapsed:9.1f} {p50:9.1f} {p95:9.1f}"
+        )
+
+    def cleanup(self):
+        storage = get_rendition_storage()
+        for image in UploadedImage.objects.filter(user=self.user):
+            rendition_cache.delete(image.rendition_key(self.preset))
+            path = image.rendition_path(self.preset)
+            if storage.exists(path):
+                storage.delete(path)
+            image.image.delete(save=False)
+        self.user.delete()
@@ -0,0 +1,31 @@
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+from images.models import UploadedImage
+from images.prerender import prerender_image
+
+
+class Command(BaseCommand):
+    help = "Render and cache the preset renditions of existing images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend",
+            choices=["sync", "thread", "process"],
+            default="sync",
+        )
+        parser.add_argument("--user", type=int, help="Only images of this user id.")
+
+    def handle(self, *args, **options):
+        images = UploadedImage.objects.order_by("id")
+        if options["user"]:
+            images = images.filter(user_id=options["user"])
+
+        futures = []
+        count = 0
+        for uploaded_image in images.iterator():
+            futures.extend(prerender_image(uploaded_image, options["backend"]))
+            count += 1
+        done, _ = wait(futures)
+        failed = sum(1 for future in done if future.exception())
+        self.stdout.write(f"Prerendered {count} images ({failed} failed).")
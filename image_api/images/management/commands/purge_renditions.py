@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from images.models import ImagePreset, UploadedImage
+from images.rendering import ImageTooLarge, UnreadableImage
+from images.renditions import ensure_renditions, purge_preset_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the cached and stored renditions of a preset, e.g. after "
+        "changing how images are rendered, and optionally render them again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("preset", type=int, help="Id of the preset.")
+        parser.add_argument(
+            "--bump-version",
+            action="store_true",
+            help="Also change the preset's rendition keys and ETags. Copies "
+            "browsers and CDNs already cached are still used until they expire.",
+        )
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Render the preset of every image linked to it afterwards.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            preset = ImagePreset.objects.get(pk=options["preset"])
+        except ImagePreset.DoesNotExist:
+            raise CommandError(f"Preset {options['preset']} does not exist.")
+
+        purged = purge_preset_renditions(preset, options["batch_size"])
+        self.stdout.write(f"Purged the renditions of {purged} images.")
+        if options["bump_version"]:
+            preset.version += 1
+            preset.save()
+            self.stdout.write(f"Preset {preset.pk} is now at version {preset.version}.")
+        if options["warm"]:
+            self.warm(preset, options["batch_size"])
+
+    def warm(self, preset, batch_size):
+        images = (
+            UploadedImage.objects.filter(imageurl__preset=preset)
+            .distinct()
+            .order_by("pk")
+        )
+        rendered = skipped = unreadable = 0
+        for uploaded_image in images.iterator(chunk_size=batch_size):
+            try:
+                rendered += len(ensure_renditions(uploaded_image, [preset]))
+            except ImageTooLarge:
+                skipped += 1
+            except UnreadableImage as exc:
+                unreadable += 1
+                self.stderr.write(f"Skipping image {uploaded_image.pk}: {exc}")
+        self.stdout.write(f"Rendered {rendered} renditions ({skipped} too large).")
+        if unreadable:
+            self.stdout.write(f"Skipped {unreadable} unreadable images.")
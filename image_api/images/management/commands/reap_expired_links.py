@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from images.models import ImageUrl
+from images.renditions import delete_renditions, rendition_in_use
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired image links, and the renditions no remaining link "
+        "needs. Meant to run periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = renditions = 0
+        while True:
+            batch = list(
+                ImageUrl.objects.expired()
+                .select_related("image", "preset")
+                .order_by("expires_at")[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            deleted += len(batch)
+            renditions += self.reap_batch(batch)
+        self.stdout.write(
+            f"Deleted {deleted} expired links and {renditions} renditions."
+        )
+
+    def reap_batch(self, batch):
+        with transaction.atomic():
+            ImageUrl.objects.filter(pk__in=[url.pk for url in batch]).delete()
+        pairs = {(url.image, url.preset) for url in batch}
+        # Renditions are shared with identical presets and duplicate uploads.
+        orphans = [
+            (image, preset)
+            for image, preset in pairs
+            if not rendition_in_use(image, preset)
+        ]
+        for image, preset in orphans:
+            delete_renditions(image, preset)
+        return len(orphans)
@@ -0,0 +1,148 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+import PIL
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from images import benchmarks
+from images.models import ImageUrl
+
+SCENARIOS = ["render", "serve_hit", "serve_miss", "list", "upload"]
+
+
+def parse_size(value):
+    try:
+        width, height = value.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise CommandError(f"Invalid size {value!r}, expected WIDTHxHEIGHT.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rendering, serving, listing and uploading images on generated "
+        "fixtures and print the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios", default=",".join(SCENARIOS), help="Comma separated."
+        )
+        parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000")
+        parser.add_argument("--formats", default="jpeg,png,webp")
+        parser.add_argument(
+            "--account-sizes",
+            default="10,100,1000",
+            help="Number of images of the account listed by the list scenario.",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument("--label", default="", help="E.g. the commit benchmarked.")
+        parser.add_argument("--output", help="Write the JSON here instead of stdout.")
+        parser.add_argument(
+            "--migrate",
+            action="store_true",
+            help="Migrate the database first, e.g. with settings_benchmark.",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options["scenarios"].split(",") if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        sizes = [parse_size(size) for size in options["sizes"].split(",")]
+        formats = options["formats"].split(",")
+        account_sizes = [int(count) for count in options["account_sizes"].split(",")]
+        self.iterations = options["iterations"]
+
+        if options["migrate"]:
+            call_command("migrate", verbosity=0)
+
+        results = []
+        # The list and upload views build absolute URLs for the request
+        # factory's host.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            fixtures = benchmarks.BenchmarkFixtures()
+            try:
+                for size in sizes:
+                    for format in formats:
+                        results.extend(
+                            self.run_image(fixtures, scenarios, size, format)
+                        )
+                if "list" in scenarios:
+                    results.extend(
+                        self.run_list(fixtures, account_sizes, options["page_size"])
+                    )
+            finally:
+                fixtures.cleanup()
+
+        report = {
+            "label": options["label"],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "pillow": PIL.__version__,
+            "database": connection.vendor,
+            "cache": settings.CACHES["renditions"]["BACKEND"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def run_image(self, fixtures, scenarios, size, format):
+        params = {"size": "{}x{}".format(*size), "format": format}
+        image = fixtures.create_image(size, format)
+        links = fixtures.create_links(image)
+        # The first preset is resized, the last is served as the original.
+        resized = ImageUrl.objects.select_related("image", "preset").get(pk=links[0].pk)
+
+        if "render" in scenarios:
+            latencies, rss = benchmarks.benchmark_render(
+                image, fixtures.presets, self.iterations
+            )
+            yield benchmarks.summarize("render", params, latencies, peak_rss_kib=rss)
+        if "serve_hit" in scenarios:
+            yield benchmarks.summarize(
+                "serve_hit",
+                params,
+                *benchmarks.benchmark_serve(resized, self.iterations),
+            )
+        if "serve_miss" in scenarios:
+            yield benchmarks.summarize(
+                "serve_miss",
+                params,
+                *benchmarks.benchmark_serve(resized, self.iterations, miss=True),
+            )
+        if "upload" in scenarios:
+            with image.image.open() as file:
+                content = file.read()
+            yield benchmarks.summarize(
+                "upload",
+                {**params, "bytes": len(content)},
+                *benchmarks.benchmark_upload(
+                    fixtures.user, content, format, self.iterations
+                ),
+            )
+
+    def run_list(self, fixtures, account_sizes, page_size):
+        template = fixtures.create_image((640, 480), "jpeg", user=fixtures.account)
+        count = 1
+        for account_size in sorted(account_sizes):
+            fixtures.grow_account(account_size - count, template)
+            count = account_size
+            yield benchmarks.summarize(
+                "list",
+                {"account_size": account_size, "page_size": page_size},
+                *benchmarks.benchmark_list(
+                    fixtures.account, self.iterations, page_size
+                ),
+            )
@@ -0,0 +1,191 @@
+"""Counters and timings of the serving hot path, in the Prometheus text format.
+
+Recording is a no-op unless ``METRICS_ENABLED`` is set. Metrics are kept per
+process, so each worker has to be scraped on its own.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HELP = {
+    "http_request_duration_seconds": "Request duration by view.",
+    "http_response_bytes_total": "Response body bytes by view.",
+    "db_queries_total": "Database queries by view.",
+    "image_link_lookup_seconds": "Time spent resolving image links.",
+    "image_link_lookups_total": "Image link lookups by link cache result.",
+    "rendition_cache_get_seconds": "Time spent reading renditions from the cache.",
+    "rendition_lookups_total": "Rendition lookups by where they were found.",
+    "rendition_renders_total": "Cache misses by how the rendition was produced.",
+    "render_decode_seconds": "Time spent decoding originals.",
+    "render_resize_seconds": "Time spent resizing renditions.",
+    "render_encode_seconds": "Time spent encoding renditions.",
+    "render_pool_workers": "Workers of the render pool.",
+    "render_pool_running": "Renders running on the render pool.",
+    "render_pool_queued": "Renders queued for the render pool.",
+    "local_cache_entries": "Entries of the in-process cache tier.",
+    "local_cache_bytes": "Bytes held by the in-process cache tier.",
+    "local_cache_evictions": "Entries evicted from the in-process cache tier.",
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        key = (name, labels)
+        index = bisect_left(BUCKETS, value)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Per bucket counts (the last one is +Inf), then the sum.
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def exposition(self, gauges=()):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(histogram)) for key, histogram in self.histograms.items()
+            )
+        lines = []
+        typed = set()
+
+        def describe(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            describe(name, "histogram")
+            count = 0
+            for bound, bucket in zip((*BUCKETS, "+Inf"), histogram):
+                count += bucket
+                le = format_labels((*labels, ("le", bound)))
+                lines.append(f"{name}_bucket{le} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram[-1]}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name, labels, value in gauges:
+            describe(name, "gauge")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Timings and queries of one request, for its Server-Timing header."""
+
+    def __init__(self):
+        self.timings = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self, total):
+        entries = [
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.timings.items()
+        ]
+        entries.append(
+            f'db;dur={self.query_seconds * 1000:.2f};desc="{self.queries} queries"'
+        )
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+def increment(name, labels=(), value=1):
+    if settings.METRICS_ENABLED:
+        registry.increment(name, labels, value)
+
+
+def record(name, seconds, timing=None, labels=()):
+    """Observe ``seconds``, also adding them to the request's ``timing``."""
+    if not settings.METRICS_ENABLED:
+        return
+    registry.observe(name, seconds, labels)
+    request_metrics = current_request.get()
+    if timing and request_metrics is not None:
+        request_metrics.add(timing, seconds)
+
+
+@contextmanager
+def timer(name, timing=None):
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start, timing)
+
+
+def record_render(timings):
+    for stage, seconds in timings.items():
+        record(f"render_{stage}_seconds", seconds, stage)
+
+
+def count_query(execute, sql, params, many, context):
+    request_metrics = current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.query_seconds += time.perf_counter() - start
+
+
+def add_query_counter(connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+def install():
+    """Count the queries of every database connection made from now on."""
+    connection_created.connect(add_query_counter, dispatch_uid="images.metrics")
+    for connection in connections.all():
+        add_query_counter(connection)
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Record request durations, response sizes and query counts by view.
+
+    Adds a ``Server-Timing`` header breaking the request down when
+    ``METRICS_SERVER_TIMING`` is set. Unused unless ``METRICS_ENABLED`` is.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the middleware as async, like MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        metrics.install()
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        return self.finish(request, response, request_metrics, start)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_request.reset(token)
+        return self.finish(request, response, request_metrics, start)
+
+    def finish(self, request, response, request_metrics, start):
+        duration = time.perf_counter() - start
+        resolver_match = request.resolver_match
+        labels = (("view", resolver_match.view_name if resolver_match else ""),)
+        metrics.record("http_request_duration_seconds", duration, labels=labels)
+        metrics.increment("db_queries_total", labels, request_metrics.queries)
+        if response.has_header("Content-Length"):
+            metrics.increment(
+                "http_response_bytes_total", labels, int(response["Content-Length"])
+            )
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = request_metrics.server_timing(duration)
+        return response
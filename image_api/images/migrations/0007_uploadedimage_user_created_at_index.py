@@ -0,0 +1,20 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0006_uploadedimage_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="uploadedimage",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="images_uplo_user_id_ea0477_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0008_uploadedimage_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadedimage",
+            name="mime_type",
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.AlterField(
+            model_name="uploadedimage",
+            name="file_size",
+            field=models.PositiveBigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="uploadedimage",
+            name="format",
+            field=models.CharField(blank=True, db_index=True, max_length=10),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0009_uploadedimage_mime_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imagepreset",
+            name="fit",
+            field=models.CharField(
+                choices=[
+                    ("fit", "Fit inside width and height"),
+                    ("fill", "Fill width and height, cropping the overflow"),
+                    ("exact", "Stretch to width and height"),
+                ],
+                default="fit",
+                max_length=5,
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:18
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0010_imagepreset_fit"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imagepreset",
+            name="optimize",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="imagepreset",
+            name="progressive",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="imagepreset",
+            name="quality",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Encoder quality for JPEG, WebP and AVIF. Empty uses the default.",
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(100),
+                ],
+            ),
+        ),
+    ]
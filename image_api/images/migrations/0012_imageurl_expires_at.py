@@ -0,0 +1,37 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:20
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def populate_expires_at(apps, schema_editor):
+    ImageUrl = apps.get_model("images", "ImageUrl")
+    batch = []
+    for image_url in ImageUrl.objects.filter(expire__isnull=False).iterator():
+        image_url.expires_at = image_url.created_at + timedelta(
+            seconds=image_url.expire
+        )
+        batch.append(image_url)
+        if len(batch) >= 1000:
+            ImageUrl.objects.bulk_update(batch, ["expires_at"])
+            batch = []
+    ImageUrl.objects.bulk_update(batch, ["expires_at"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0011_imagepreset_encoding"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imageurl",
+            name="expires_at",
+            field=models.DateTimeField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(populate_expires_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0012_imageurl_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="imagepreset",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
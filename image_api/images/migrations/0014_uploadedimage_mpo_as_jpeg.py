@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def mpo_as_jpeg(apps, schema_editor):
+    UploadedImage = apps.get_model("images", "UploadedImage")
+    UploadedImage.objects.filter(format="MPO").update(
+        format="JPEG", mime_type="image/jpeg"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0013_imagepreset_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(mpo_as_jpeg, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def exact_fit_for_existing_presets(apps, schema_editor):
+    # Presets with both dimensions were documented to resize to exactly
+    # those dimensions before fit modes existed; "fit" is for new presets.
+    ImagePreset = apps.get_model("images", "ImagePreset")
+    ImagePreset.objects.filter(
+        width__isnull=False, height__isnull=False, fit="fit"
+    ).update(fit="exact")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("images", "0014_uploadedimage_mpo_as_jpeg"),
+    ]
+
+    operations = [
+        migrations.RunPython(exact_fit_for_existing_presets, migrations.RunPython.noop),
+    ]
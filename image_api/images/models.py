@@ -1,24 +1,59 @@
+import copy
+import hashlib
 import mimetypes
 import uuid
 from datetime import timedelta
-from pathlib import Path
+from pathlib import PurePosixPath
 
 from common.mixins import TimestampedModel
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
 from PIL import Image
 from rest_framework.reverse import reverse
 
+from . import rendering
+
 
 class ImagePreset(TimestampedModel):
+    class Fit(models.TextChoices):
+        FIT = rendering.FIT, "Fit inside width and height"
+        FILL = rendering.FILL, "Fill width and height, cropping the overflow"
+        EXACT = rendering.EXACT, "Stretch to width and height"
+
     name = models.CharField(max_length=40)
     height = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     width = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    fit = models.CharField(max_length=5, choices=Fit.choices, default=Fit.FIT)
+    quality = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        help_text="Encoder quality for JPEG, WebP and AVIF. Empty uses the default.",
+    )
+    optimize = models.BooleanField(default=False)
+    progressive = models.BooleanField(default=False)
+    # Part of rendition keys and so of ETags. Bumped by purge_renditions to
+    # have renditions re-rendered and refetched by clients.
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.name
 
+    @property
+    def geometry(self):
+        return self.width, self.height, self.fit
+
+    @property
+    def encoding(self):
+        return self.quality, self.optimize, self.progressive
+
+    @property
+    def spec(self):
+        return self.geometry, self.encoding
+
 
 def user_directory_path(instance, filename):
     return f"{instance.user.id}/{filename}"
@@ -31,63 +66,201 @@ class UploadedImage(TimestampedModel):
         on_delete=models.CASCADE,
         related_name="uploaded_images",
     )
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    format = models.CharField(max_length=10, blank=True, db_index=True)
+    mime_type = models.CharField(max_length=40, blank=True, db_index=True)
+    file_size = models.PositiveBigIntegerField(blank=True, null=True, db_index=True)
+
+    METADATA_FIELDS = [
+        "content_hash",
+        "width",
+        "height",
+        "format",
+        "mime_type",
+        "file_size",
+    ]
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-created_at", "-id"])]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get("image")
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded_image = getattr(self, "_loaded_image", None)
+        if loaded_image is not None and self.image.name != loaded_image:
+            # The file was replaced: keep the old version around so its
+            # renditions can be purged, and describe the new one.
+            self.replaced = copy.copy(self)
+            self.replaced.image = loaded_image
+            self.content_hash, self.width = "", None
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *self.METADATA_FIELDS}
+        if self.image and self.needs_metadata:
+            self.populate_metadata()
+        super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+
+    @property
+    def needs_metadata(self):
+        return not self.content_hash or self.width is None or not self.mime_type
+
+    def populate_metadata(self):
+        if not self.content_hash:
+            self.content_hash = self.compute_content_hash()
+        # Upload fields attach the header they validated; otherwise read it.
+        header = getattr(self.image.file, "image_header", None)
+        if header is None:
+            header = rendering.read_header(self.image)
+        self.width, self.height, self.format = header
+        self.mime_type = Image.MIME.get(self.format, "")
+        self.file_size = self.image.size
+
+    def compute_content_hash(self):
+        digest = hashlib.sha256()
+        for chunk in self.image.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
 
     @property
     def filename(self):
-        return Path(self.image.path).name
+        return PurePosixPath(self.image.name).name
+
+    def rendition_name(self, preset, filetype=None):
+        if not self.content_hash:
+            self.content_hash = self.compute_content_hash()
+            self.save(update_fields=["content_hash"])
+        width = preset.width or ""
+        height = preset.height or ""
+        fit = "" if preset.fit == ImagePreset.Fit.FIT else f"-{preset.fit}"
+        quality = f"-q{preset.quality}" if preset.quality else ""
+        optimize = "-o" if preset.optimize else ""
+        progressive = "-p" if preset.progressive else ""
+        # Keys of presets never purged stay as they were before versioning.
+        version = f"-v{preset.version}" if preset.version > 1 else ""
+        filetype = filetype or self.filetype
+        return (
+            f"{self.content_hash}/{width}x{height}{fit}{quality}{optimize}"
+            f"{progressive}{version}.{filetype}"
+        )
+
+    def rendition_size(self, preset):
+        return rendering.target_size((self.width, self.height), *preset.geometry)
+
+    def rendition_is_original(self, preset):
+        if not preset.width and not preset.height:
+            return True
+        if self.width is None:
+            return False
+        return self.rendition_size(preset) == (self.width, self.height)
+
+    def rendition_key(self, preset, filetype=None):
+        return f"rendition:{self.rendition_name(preset, filetype)}"
+
+    def rendition_path(self, preset, filetype=None):
+        return f"{self.user_id}/renditions/{self.rendition_name(preset, filetype)}"
 
     @property
     def filetype(self):
+        if self.format:
+            return self.format.lower()
         mimetype, _ = mimetypes.guess_type(self.filename)
         _, filetype = mimetype.split("/")
         return filetype
 
 
+class ImageUrlQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_expires_at()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+    def active(self):
+        return self.filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now())
+        )
+
+
 class ImageUrl(TimestampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4)
     preset = models.ForeignKey("ImagePreset", on_delete=models.CASCADE)
     image = models.ForeignKey("UploadedImage", on_delete=models.CASCADE)
     expire = models.IntegerField(blank=True, null=True)
+    expires_at = models.DateTimeField(
+        blank=True, null=True, db_index=True, editable=False
+    )
+
+    objects = ImageUrlQuerySet.as_manager()
 
     def __str__(self):
         return str(self.id)
 
+    def save(self, *args, **kwargs):
+        self.set_expires_at()
+        super().save(*args, **kwargs)
+
+    def set_expires_at(self):
+        if self.expire is None:
+            self.expires_at = None
+        else:
+            created_at = self.created_at or timezone.now()
+            self.expires_at = created_at + timedelta(seconds=self.expire)
+
     @property
     def expired(self):
-        if self.expire is None:
+        if self.expires_at is None:
             return False
-        return timezone.now() > (self.created_at + timedelta(seconds=self.expire))
+        return timezone.now() > self.expires_at
 
     @property
     def expire_in(self):
-        if self.expire is None:
+        if self.expires_at is None:
             return None
-        expire_in = (
-            (self.created_at + timedelta(seconds=self.expire)) - timezone.now()
-        ).seconds
-        return max(0, expire_in)
+        return max(0, int((self.expires_at - timezone.now()).total_seconds()))
 
     @property
     def expire_at(self):
-        if self.expire is None:
-            return None
-        return self.created_at + timedelta(seconds=self.expire)
+        return self.expires_at
+
+    @cached_property
+    def filetype(self):
+        """Format the link is served in, set by content negotiation."""
+        return self.image.filetype
+
+    @property
+    def mime_type(self):
+        if self.filetype == self.image.filetype:
+            return self.image.mime_type
+        return Image.MIME.get(self.filetype.upper(), "")
+
+    @property
+    def filename(self):
+        filename = PurePosixPath(f"{self.preset.name}_{self.image.filename}")
+        if self.filetype != self.image.filetype:
+            filename = filename.with_suffix(f".{self.filetype}")
+        return str(filename)
+
+    @property
+    def rendition_key(self):
+        return self.image.rendition_key(self.preset, self.filetype)
+
+    @property
+    def rendition_path(self):
+        return self.image.rendition_path(self.preset, self.filetype)
 
     def generate_url(self, request=None):
         return reverse("image-url-view", args=[self.id], request=request)
 
     def apply_preset(self):
         img = Image.open(self.image.image.path)
-        width, height = img.size
-        new_height = self.preset.height
-        new_width = self.preset.width
-        if not new_height and not new_width:
-            return img
-
-        if new_height:
-            new_width = new_height * width / height
-        elif new_width:
-            new_height = new_width * height / width
-
-        img = img.resize((new_width, new_height), Image.ANTIALIAS)
-        return img
+        return rendering.apply_preset(img, *self.preset.geometry)
@@ -0,0 +1,119 @@
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import rendering
+from .models import ImagePreset
+from .renditions import (
+    max_render_pixels,
+    missing_presets,
+    render_formats,
+    served_filetypes,
+    store_renditions,
+)
+
+_executors = {}
+
+
+def get_executor(backend):
+    if backend not in _executors:
+        workers = settings.RENDITION_PRERENDER_WORKERS
+        if backend == "thread":
+            _executors[backend] = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="prerender"
+            )
+        elif backend == "process":
+            _executors[backend] = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f"Unknown prerender backend: {backend}")
+    return _executors[backend]
+
+
+def image_presets(uploaded_image):
+    return ImagePreset.objects.filter(imageurl__image=uploaded_image).distinct()
+
+
+def prerender_image(uploaded_image, backend=None):
+    """Render the missing renditions of ``uploaded_image``'s links.
+
+    Every format a link can be negotiated in is rendered, so that first hits
+    are served from the cache whatever the client accepts.
+    """
+    backend = backend or settings.RENDITION_PRERENDER_BACKEND
+    filetypes = served_filetypes(uploaded_image)
+    presets = missing_presets(uploaded_image, image_presets(uploaded_image), filetypes)
+    if not presets:
+        return []
+    max_pixels = max_render_pixels(uploaded_image)
+    args = (uploaded_image, presets, filetypes, max_pixels)
+    if backend == "sync":
+        try:
+            render_formats(uploaded_image, presets, filetypes, max_pixels=max_pixels)
+        except (rendering.ImageTooLarge, rendering.UnreadableImage) as exc:
+            logging.warning("Not prerendering image %s: %s", uploaded_image.pk, exc)
+        return []
+
+    executor = get_executor(backend)
+    if backend == "thread":
+        return [executor.submit(_render_logged, *args)]
+    return [_submit_to_process(executor, *args)]
+
+
+def _render_logged(uploaded_image, presets, filetypes, max_pixels):
+    try:
+        return render_formats(uploaded_image, presets, filetypes, max_pixels=max_pixels)
+    except Exception:
+        logging.exception("Failed to prerender image %s", uploaded_image.pk)
+        raise
+
+
+def _submit_to_process(executor, uploaded_image, presets, filetypes, max_pixels):
+    stored = Future()
+
+    def store(future):
+        try:
+            rendered, _ = future.result()
+            for filetype, specs in rendered.items():
+                store_renditions(uploaded_image, presets, specs, filetype)
+        except Exception as exc:
+            logging.exception("Failed to prerender image %s", uploaded_image.pk)
+            stored.set_exception(exc)
+        else:
+            stored.set_result(presets)
+
+    executor.submit(
+        rendering.render_timed,
+        uploaded_image.image.path,
+        {preset.spec for preset in presets},
+        filetypes,
+        max_pixels,
+    ).add_done_callback(store)
+    return stored
+
+
+def run_in_background(func, *args):
+    """Run ``func`` on the prerender thread pool, or inline with the sync backend.
+
+    The process backend also uses threads, as ``func`` may query the database.
+    """
+    if settings.RENDITION_PRERENDER_BACKEND == "sync":
+        func(*args)
+        return None
+    return get_executor("thread").submit(_run_logged, func, *args)
+
+
+def _run_logged(func, *args):
+    try:
+        return func(*args)
+    except Exception:
+        logging.exception("%s failed in the background", func.__name__)
+        raise
+    finally:
+        close_old_connections()
+
+
+def schedule_prerender(uploaded_image):
+    if settings.RENDITION_PRERENDER:
+        transaction.on_commit(lambda: prerender_image(uploaded_image))
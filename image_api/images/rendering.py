@@ -0,0 +1,241 @@
+import resource
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, UnidentifiedImageError
+
+# Let Pillow shrink by whole factors with a cheap box reduction until the
+# image is within this factor of the target, then finish with ANTIALIAS.
+REDUCING_GAP = 3.0
+
+# Formats Pillow reports for files browsers know under another type. Camera
+# JPEGs carrying MPF data open as MPO, but are served and rendered as JPEG.
+WEB_FORMATS = {"MPO": "JPEG"}
+
+
+def read_header(file):
+    """Return ``(width, height, format)`` of an image without decoding it."""
+    file.seek(0)
+    with Image.open(file) as img:
+        header = img.width, img.height, WEB_FORMATS.get(img.format, img.format)
+    file.seek(0)
+    return header
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class UnreadableImage(ValueError):
+    """The original is truncated, corrupt or not an image Pillow can decode."""
+
+
+# Only the header of uploads is checked, so decoding can still fail.
+DECODE_ERRORS = (UnidentifiedImageError, OSError, SyntaxError)
+
+
+FIT = "fit"
+FILL = "fill"
+EXACT = "exact"
+
+
+@lru_cache(maxsize=4096)
+def target_geometry(size, preset_width, preset_height, fit=FIT):
+    """Return ``(resize_size, crop_box)`` turning ``size`` into the preset.
+
+    ``fit`` scales the image to fit inside the preset, ``fill`` scales it to
+    cover the preset and crops the overflow around the centre, and ``exact``
+    stretches it to the preset. With only one dimension set, all three keep
+    the aspect ratio. ``crop_box`` is ``None`` unless something is cropped.
+    """
+    width, height = size
+    if not preset_width and not preset_height:
+        return size, None
+
+    if not preset_width or not preset_height:
+        if preset_height:
+            scale = float(preset_height) / height
+        else:
+            scale = float(preset_width) / width
+        return _scaled(size, scale), None
+
+    box = _scaled((preset_width, preset_height), 1)
+    if fit == EXACT:
+        return box, None
+
+    width_scale = float(preset_width) / width
+    height_scale = float(preset_height) / height
+    if fit == FILL:
+        scale = max(width_scale, height_scale)
+        resize_size = _scaled(size, scale)
+        box = min(box[0], resize_size[0]), min(box[1], resize_size[1])
+        left = (resize_size[0] - box[0]) // 2
+        top = (resize_size[1] - box[1]) // 2
+        crop_box = (left, top, left + box[0], top + box[1])
+        if crop_box == (0, 0) + resize_size:
+            crop_box = None
+        return resize_size, crop_box
+
+    scale = min(width_scale, height_scale)
+    return _scaled(size, scale), None
+
+
+def _scaled(size, scale):
+    # Extreme aspect ratios would otherwise round a side down to 0 pixels.
+    width, height = size
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def target_size(size, preset_width, preset_height, fit=FIT):
+    resize_size, crop_box = target_geometry(size, preset_width, preset_height, fit)
+    if crop_box is None:
+        return resize_size
+    left, top, right, bottom = crop_box
+    return right - left, bottom - top
+
+
+def apply_preset(img, preset_width, preset_height, fit=FIT):
+    geometry = (preset_width, preset_height, fit)
+    return apply_presets(img, [geometry])[geometry]
+
+
+def apply_presets(img, geometries, timings=None, max_pixels=None):
+    """Resize ``img`` to every ``(preset_width, preset_height, fit)`` geometry.
+
+    The source is decoded once, and each rendition is derived from the
+    previous larger one, so the cost is dominated by the largest preset.
+    Decode and resize seconds are added to ``timings`` when given.
+
+    Raises ``ImageTooLarge`` instead of decoding more than ``max_pixels``.
+    """
+    original_size = img.size
+    targets = {
+        geometry: target_geometry(original_size, *geometry) for geometry in geometries
+    }
+    ordered = sorted(targets.items(), key=lambda item: _area(item[1][0]), reverse=True)
+    if not ordered:
+        return {}
+
+    draft_size = (
+        max(resize_size[0] for resize_size, _ in targets.values()),
+        max(resize_size[1] for resize_size, _ in targets.values()),
+    )
+    if draft_size != original_size:
+        # JPEG sources are decoded at the smallest DCT scale still >= draft_size.
+        img.draft(img.mode, draft_size)
+    if max_pixels and _area(img.size) > max_pixels:
+        raise ImageTooLarge(
+            "Rendering the {}x{} image would decode more than {} pixels.".format(
+                *original_size, max_pixels
+            )
+        )
+    start = time.perf_counter()
+    img.load()
+    decoded = time.perf_counter()
+
+    results = {}
+    source = img
+    for geometry, (resize_size, crop_box) in ordered:
+        if resize_size == original_size:
+            resized = img
+        else:
+            if source.width < resize_size[0] or source.height < resize_size[1]:
+                source = img
+            resized = source.resize(
+                resize_size, Image.ANTIALIAS, reducing_gap=REDUCING_GAP
+            )
+            if geometry[2] != EXACT:
+                # Only renditions that keep the aspect ratio can feed smaller ones.
+                source = resized
+        results[geometry] = resized.crop(crop_box) if crop_box else resized
+    if timings is not None:
+        timings["decode"] = decoded - start
+        timings["resize"] = time.perf_counter() - decoded
+    return results
+
+
+def _area(size):
+    width, height = size
+    return width * height
+
+
+def can_encode(filetype):
+    Image.init()
+    return filetype.upper() in Image.SAVE
+
+
+def encode(img, filetype, quality=None, optimize=False, progressive=False):
+    """Encode ``img``; options a format doesn't support are ignored by Pillow."""
+    params = {}
+    if quality:
+        params["quality"] = quality
+    if optimize:
+        params["optimize"] = True
+    if progressive:
+        params["progressive"] = True
+    img_data = BytesIO()
+    img.save(img_data, filetype, **params)
+    return img_data.getvalue()
+
+
+def render(path, specs, filetype, max_pixels=None):
+    """Render ``(geometry, encoding)`` specs of the image at ``path``.
+
+    ``encoding`` is a ``(quality, optimize, progressive)`` tuple. Returns a
+    mapping of spec to the encoded rendition.
+    """
+    return render_timed(path, specs, [filetype], max_pixels)[0][filetype]
+
+
+def render_timed(path, specs, filetypes, max_pixels=None):
+    """Render specs in each of ``filetypes`` from a single decode.
+
+    Returns a mapping of filetype to ``render``'s mapping, and the decode,
+    resize and encode seconds.
+    """
+    timings = {}
+    with decode_errors():
+        img = Image.open(path)
+    with img:
+        with decode_errors():
+            resized = apply_presets(
+                img, {geometry for geometry, _ in specs}, timings, max_pixels
+            )
+        start = time.perf_counter()
+        rendered = {
+            filetype: {
+                (geometry, encoding): encode(resized[geometry], filetype, *encoding)
+                for geometry, encoding in specs
+            }
+            for filetype in filetypes
+        }
+        timings["encode"] = time.perf_counter() - start
+    return rendered, timings
+
+
+@contextmanager
+def decode_errors():
+    """Turn Pillow's errors opening or decoding an image into ours."""
+    try:
+        yield
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(str(exc)) from exc
+    except FileNotFoundError:
+        raise
+    except DECODE_ERRORS as exc:
+        raise UnreadableImage(f"The image could not be decoded: {exc}") from exc
+
+
+def time_renders(path, specs, filetype, iterations):
+    """Render ``iterations`` times; return the latencies and peak RSS in KiB.
+
+    Used by the benchmarks in a fresh process, hence free of Django imports.
+    """
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render(path, specs, filetype)
+        latencies.append(time.perf_counter() - start)
+    return latencies, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
@@ -0,0 +1,321 @@
+import logging
+from io import BytesIO
+
+from accounts.models import Plan
+from common.cache import TieredCache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, get_storage_class
+from django.utils.connection import ConnectionProxy
+
+from . import metrics, rendering
+from .executor import get_render_executor
+from .locks import single_flight
+from .models import ImagePreset, ImageUrl, UploadedImage
+
+rendition_cache = TieredCache(
+    ConnectionProxy(caches, "renditions"), "RENDITION_LOCAL_CACHE_SIZE"
+)
+
+
+def get_rendition_storage():
+    if settings.RENDITION_STORAGE:
+        return get_storage_class(settings.RENDITION_STORAGE)()
+    return default_storage
+
+
+def is_cacheable(data):
+    return len(data) <= settings.RENDITION_CACHE_MAX_SIZE
+
+
+def store_rendition(uploaded_image, preset, data, filetype=None):
+    storage = get_rendition_storage()
+    path = uploaded_image.rendition_path(preset, filetype)
+    if not storage.exists(path):
+        storage.save(path, ContentFile(data))
+    if is_cacheable(data):
+        rendition_cache.set(uploaded_image.rendition_key(preset, filetype), data)
+
+
+def store_renditions(uploaded_image, presets, rendered, filetype=None):
+    for preset in presets:
+        store_rendition(uploaded_image, preset, rendered[preset.spec], filetype)
+
+
+def max_render_pixels(uploaded_image):
+    """The pixel budget of the plan of ``uploaded_image``'s owner."""
+    plan = Plan.objects.filter(subscribed_users=uploaded_image.user_id).first()
+    return plan.image_max_pixels if plan else settings.IMAGE_MAX_PIXELS
+
+
+def served_filetypes(uploaded_image):
+    """The formats renditions of ``uploaded_image`` can be negotiated in.
+
+    That is the original's format, then those of ``RENDITION_FORMATS`` Pillow
+    can encode.
+    """
+    filetypes = [uploaded_image.filetype]
+    for filetype in settings.RENDITION_FORMATS:
+        if filetype not in filetypes and rendering.can_encode(filetype):
+            filetypes.append(filetype)
+    return filetypes
+
+
+def render_renditions(
+    uploaded_image, presets, executor=None, filetype=None, max_pixels=None
+):
+    """Render and store ``presets`` of ``uploaded_image`` from a single decode.
+
+    Renditions are encoded as ``filetype``, the original's format by default.
+    Returns a mapping of preset to the encoded rendition. See
+    ``render_formats`` for the other arguments.
+    """
+    filetype = filetype or uploaded_image.filetype
+    rendered = render_formats(uploaded_image, presets, [filetype], executor, max_pixels)
+    return rendered[filetype]
+
+
+def render_formats(uploaded_image, presets, filetypes, executor=None, max_pixels=None):
+    """Render and store ``presets`` of ``uploaded_image`` in every ``filetypes``.
+
+    The original is decoded once for all of them. The render runs on
+    ``executor`` when given, otherwise inline. Returns a mapping of filetype
+    to a mapping of preset to the encoded rendition, or raises
+    ``rendering.ImageTooLarge`` past ``max_pixels``, by default the owner's
+    pixel budget, and ``rendering.UnreadableImage`` for originals that can't
+    be decoded, which aren't tried again for ``RENDITION_FAILURE_TIMEOUT``.
+    """
+    failure_key = f"unreadable:{uploaded_image.image.name}"
+    failure = rendition_cache.get(failure_key)
+    if failure:
+        raise rendering.UnreadableImage(failure.decode())
+    args = (
+        uploaded_image.image.path,
+        {preset.spec for preset in presets},
+        filetypes,
+        max_pixels or max_render_pixels(uploaded_image),
+    )
+    try:
+        if executor is None:
+            rendered, timings = rendering.render_timed(*args)
+        else:
+            future = executor.submit(
+                uploaded_image.user_id, rendering.render_timed, *args
+            )
+            rendered, timings = future.result()
+    except rendering.UnreadableImage as exc:
+        # The renditions cache only stores bytes.
+        rendition_cache.set(
+            failure_key, str(exc).encode(), settings.RENDITION_FAILURE_TIMEOUT
+        )
+        raise
+    metrics.record_render(timings)
+    for filetype, specs in rendered.items():
+        store_renditions(uploaded_image, presets, specs, filetype)
+    return {
+        filetype: {preset: specs[preset.spec] for preset in presets}
+        for filetype, specs in rendered.items()
+    }
+
+
+def render_rendition(image_url, max_pixels=None):
+    rendered = render_renditions(
+        image_url.image,
+        [image_url.preset],
+        get_render_executor(),
+        image_url.filetype,
+        max_pixels,
+    )
+    return BytesIO(rendered[image_url.preset])
+
+
+def count_lookup(result):
+    metrics.increment("rendition_lookups_total", (("result", result),))
+
+
+def count_render(result):
+    metrics.increment("rendition_renders_total", (("result", result),))
+
+
+def lookup_rendition(image_url, count=True):
+    """Return the cached or stored rendition of ``image_url``, or ``None``.
+
+    ``count`` records where it was found in ``rendition_lookups_total``.
+    """
+    key = image_url.rendition_key
+    with metrics.timer("rendition_cache_get_seconds", "cache"):
+        data, tier = rendition_cache.get_tiered(key)
+    if data:
+        logging.debug("Cache hit")
+        if tier == "cache":
+            rendition_cache.set_local(key, data, image_url.expire_in)
+        if count:
+            count_lookup(tier)
+        return BytesIO(data)
+
+    storage = get_rendition_storage()
+    path = image_url.rendition_path
+    if storage.exists(path):
+        logging.debug("Storage hit")
+        if count:
+            count_lookup("storage")
+        if storage.size(path) <= settings.RENDITION_CACHE_MAX_SIZE:
+            with storage.open(path) as rendition:
+                data = rendition.read()
+            rendition_cache.set(key, data, local_timeout=image_url.expire_in)
+            return BytesIO(data)
+        return storage.open(path)
+    if count:
+        count_lookup("miss")
+    return None
+
+
+def open_original(uploaded_image):
+    storage = uploaded_image.image.storage
+    return storage.open(uploaded_image.image.name)
+
+
+def find_rendition(image_url):
+    """Return the stored rendition of ``image_url`` or ``None`` if missing."""
+    if image_url.image.rendition_is_original(image_url.preset):
+        logging.debug("Serving original")
+        count_lookup("original")
+        return open_original(image_url.image)
+    return lookup_rendition(image_url)
+
+
+def render_missing_rendition(image_url, max_pixels=None):
+    logging.debug("Cache miss")
+    lock_name = f"lock:{image_url.rendition_key}"
+    with single_flight(rendition_cache, lock_name) as acquired:
+        if not acquired:
+            logging.warning("Timed out waiting to render %s", image_url.rendition_key)
+            count_render("lock_timeout")
+            return render_rendition(image_url, max_pixels)
+        # Another request may have rendered it while we waited for the lock.
+        img_data = lookup_rendition(image_url, count=False)
+        if img_data is not None:
+            count_render("coalesced")
+            return img_data
+        img_data = render_rendition(image_url, max_pixels)
+        count_render("rendered")
+        return img_data
+
+
+def get_rendition(image_url):
+    img_data = find_rendition(image_url)
+    if img_data is not None:
+        return img_data
+    return render_missing_rendition(image_url)
+
+
+def delete_renditions(uploaded_image, preset):
+    """Drop every stored and cached format of a rendition."""
+    storage = get_rendition_storage()
+    filetypes = {uploaded_image.filetype, *settings.RENDITION_FORMATS}
+    rendition_cache.delete_many(
+        [uploaded_image.rendition_key(preset, filetype) for filetype in filetypes]
+    )
+    for filetype in filetypes:
+        path = uploaded_image.rendition_path(preset, filetype)
+        if storage.exists(path):
+            storage.delete(path)
+
+
+def rendition_exists(uploaded_image, preset, filetype=None):
+    return rendition_cache.has_key(
+        uploaded_image.rendition_key(preset, filetype)
+    ) or get_rendition_storage().exists(uploaded_image.rendition_path(preset, filetype))
+
+
+def missing_presets(uploaded_image, presets, filetypes=None):
+    """The ``presets`` missing a rendition in any of ``filetypes``.
+
+    ``filetypes`` defaults to every format links can be served in.
+    """
+    filetypes = filetypes or served_filetypes(uploaded_image)
+    return [
+        preset
+        for preset in presets
+        if not uploaded_image.rendition_is_original(preset)
+        and not all(
+            rendition_exists(uploaded_image, preset, filetype) for filetype in filetypes
+        )
+    ]
+
+
+def ensure_renditions(uploaded_image, presets):
+    filetypes = served_filetypes(uploaded_image)
+    presets = missing_presets(uploaded_image, presets, filetypes)
+    if presets:
+        render_formats(uploaded_image, presets, filetypes)
+    return presets
+
+
+def matching_presets(preset):
+    """``preset`` and the presets rendering the same way, which share renditions."""
+    return ImagePreset.objects.filter(
+        width=preset.width,
+        height=preset.height,
+        fit=preset.fit,
+        quality=preset.quality,
+        optimize=preset.optimize,
+        progressive=preset.progressive,
+        version=preset.version,
+    )
+
+
+def rendition_in_use(uploaded_image, preset):
+    """Whether a link still serves the ``preset`` rendition of ``uploaded_image``.
+
+    That is any link of the image or another upload of the same file by the
+    same user, to ``preset`` or a preset rendering the same way.
+    """
+    links = ImageUrl.objects.filter(preset__in=matching_presets(preset))
+    if uploaded_image.content_hash:
+        links = links.filter(
+            image__user_id=uploaded_image.user_id,
+            image__content_hash=uploaded_image.content_hash,
+        )
+    else:
+        links = links.filter(image=uploaded_image)
+    return links.exists()
+
+
+def purge_preset_renditions(preset, batch_size=1000):
+    """Delete the renditions of ``preset`` of every image linked to it.
+
+    Images also linked to another preset rendering the same way share the
+    renditions, so theirs are kept. Returns the number of images purged.
+    """
+    if not preset.width and not preset.height:
+        return 0
+    twins = matching_presets(preset).exclude(pk=preset.pk)
+    images = (
+        UploadedImage.objects.filter(imageurl__preset=preset)
+        .exclude(imageurl__preset__in=twins)
+        .distinct()
+        .order_by("pk")
+    )
+    count = 0
+    for uploaded_image in images.iterator(chunk_size=batch_size):
+        delete_renditions(uploaded_image, preset)
+        count += 1
+    return count
+
+
+def purge_image_renditions(uploaded_image, presets):
+    """Delete the ``presets`` renditions of an image that is gone or replaced.
+
+    They are kept while another image of the same user has the same content.
+    """
+    if not uploaded_image.content_hash:
+        return
+    duplicates = UploadedImage.objects.filter(
+        user_id=uploaded_image.user_id, content_hash=uploaded_image.content_hash
+    ).exclude(pk=uploaded_image.pk)
+    if duplicates.exists():
+        return
+    for preset in presets:
+        delete_renditions(uploaded_image, preset)
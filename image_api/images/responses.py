@@ -0,0 +1,163 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RenditionResponse(FileResponse):
+    block_size = 64 * 1024
+
+
+class RangeFile:
+    """Expose ``length`` bytes of ``file`` starting at its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """Return the inclusive ``(start, end)`` of a single byte range.
+
+    Returns ``None`` when the header should be ignored (malformed or asking
+    for several ranges) and raises ``RangeNotSatisfiable`` when the range
+    lies outside the file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if start >= size:
+            raise RangeNotSatisfiable
+        if end < start:
+            return None
+        return start, min(end, size - 1)
+    if last:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+    return None
+
+
+def accepted_types(header):
+    """Return the media types ``header`` lists explicitly with a non-zero q."""
+    types = set()
+    for item in header.split(","):
+        media_type, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            types.add(media_type.strip().lower())
+    return types
+
+
+def file_size(file):
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    return size
+
+
+def content_disposition(filename):
+    try:
+        filename.encode("ascii")
+        return 'inline; filename="{}"'.format(filename.replace('"', r"\""))
+    except UnicodeEncodeError:
+        return "inline; filename*=utf-8''{}".format(quote(filename))
+
+
+def filesystem_path(file):
+    path = getattr(file, "name", None)
+    if isinstance(path, str) and os.path.isabs(path):
+        return path
+    return None
+
+
+def sendfile_response(file, filename, content_type):
+    """Hand the transfer of ``file`` to the web server if configured to.
+
+    Returns ``None`` when sendfile is disabled or ``file`` does not live on
+    the local filesystem.
+    """
+    mode = settings.RENDITION_SENDFILE
+    path = filesystem_path(file)
+    if not mode or path is None:
+        return None
+    file.close()
+
+    response = HttpResponse(content_type=content_type)
+    response["Content-Disposition"] = content_disposition(filename)
+    if mode == "x-accel-redirect":
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT)
+        response["X-Accel-Redirect"] = settings.RENDITION_SENDFILE_URL + quote(
+            relative_path
+        )
+    else:
+        response["X-Sendfile"] = path
+    return response
+
+
+def file_response(request, file, filename, content_type, etag=None):
+    """Stream ``file``, honouring a single-range ``Range`` request."""
+    response = sendfile_response(file, filename, content_type)
+    if response is not None:
+        return response
+
+    size = file_size(file)
+    byte_range = None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if "HTTP_RANGE" in request.META and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(request.META["HTTP_RANGE"], size)
+        except RangeNotSatisfiable:
+            file.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = RenditionResponse(file, filename=filename, content_type=content_type)
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = RenditionResponse(
+            RangeFile(file, end - start + 1),
+            filename=filename,
+            content_type=content_type,
+            status=206,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -1,13 +1,19 @@
 from collections import defaultdict
 
+from django.conf import settings
 from django.db import transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
+from .bulk import BulkUploader, iter_archive
+from .fields import ImageHeaderField
 from .models import ImageUrl, UploadedImage
+from .prerender import schedule_prerender
 
 
 class UploadedImageSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(write_only=True)
+    image = ImageHeaderField(write_only=True)
     expire = serializers.IntegerField(
         max_value=30000,
         min_value=300,
@@ -21,6 +27,19 @@ class UploadedImageSerializer(serializers.ModelSerializer):
         model = UploadedImage
         fields = ["id", "image", "image_links", "expire", "user"]
 
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get("fields")
+        if requested:
+            for name in set(fields) - set(requested):
+                fields.pop(name)
+        request = self.context.get("request")
+        plan = getattr(request.user, "plan", None) if request else None
+        if "image" in fields and plan:
+            fields["image"].max_pixels = plan.image_max_pixels
+            fields["image"].max_size = plan.image_max_size
+        return fields
+
     @transaction.atomic
     def create(self, validated_data):
         expire = validated_data.pop("expire", None)
@@ -44,6 +63,7 @@ class UploadedImageSerializer(serializers.ModelSerializer):
                 for preset in presets
             ]
         )
+        schedule_prerender(uploaded_image)
 
     def validate_expire(self, value):
         user = self.context["request"].user
@@ -53,13 +73,24 @@ class UploadedImageSerializer(serializers.ModelSerializer):
             )
         return value
 
+    @cached_property
+    def _image_url_parts(self):
+        # Reverse the link URL once and splice each id into it, instead of
+        # resolving the URL pattern for every link of every image.
+        placeholder = "image-url-id"
+        url = reverse(
+            "image-url-view", args=[placeholder], request=self.context["request"]
+        )
+        return url.rsplit(placeholder, 1)
+
     def get_image_links(self, obj):
         urls = obj.imageurl_set.all()
+        url_prefix, url_suffix = self._image_url_parts
         image_links = defaultdict(list)
         for url in urls:
             image_links[url.preset.name].append(
                 {
-                    "url": url.generate_url(self.context["request"]),
+                    "url": f"{url_prefix}{url.id}{url_suffix}",
                     "expired": url.expired,
                     "expire_at": url.expire_at,
                 }
@@ -73,3 +104,50 @@ class ExpireOnlySerializer(UploadedImageSerializer):
     class Meta:
         model = UploadedImage
         fields = ["id", "image_links", "expire", "user"]
+
+
+class BulkUploadSerializer(serializers.Serializer):
+    images = serializers.ListField(
+        child=serializers.FileField(), required=False, allow_empty=True
+    )
+    archive = serializers.FileField(required=False)
+    expire = serializers.IntegerField(max_value=30000, min_value=300, required=False)
+
+    validate_expire = UploadedImageSerializer.validate_expire
+
+    def validate_images(self, images):
+        # Checked up front, as files are stored in batches while reading them.
+        if len(images) > settings.BULK_UPLOAD_MAX_FILES:
+            raise serializers.ValidationError(
+                f"A bulk upload can contain at most {settings.BULK_UPLOAD_MAX_FILES} "
+                "files."
+            )
+        return images
+
+    def validate(self, attrs):
+        if not attrs.get("images") and not attrs.get("archive"):
+            raise serializers.ValidationError("Provide images or an archive.")
+        return attrs
+
+    def create(self, validated_data):
+        uploader = BulkUploader(
+            self.context["request"].user,
+            UploadedImageSerializer(context=self.context),
+            expire=validated_data.get("expire"),
+        )
+        for upload in validated_data.get("images", []):
+            uploader.add(upload)
+        archive = validated_data.get("archive")
+        if archive:
+            try:
+                max_size = uploader.image_field.max_size
+                for upload in iter_archive(archive, max_size):
+                    if not uploader.add(upload):
+                        break
+            except serializers.ValidationError as exc:
+                if not uploader.results:
+                    raise
+                # Files read before the archive broke off may be stored already.
+                uploader.add_errors(archive.name, exc.detail["archive"])
+        uploader.flush()
+        return uploader.results
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .links import invalidate_links, invalidate_related
+from .models import ImagePreset, ImageUrl, UploadedImage
+from .prerender import run_in_background
+from .renditions import purge_image_renditions, purge_preset_renditions
+
+
+@receiver([post_save, post_delete], sender=ImageUrl)
+def invalidate_link(sender, instance, **kwargs):
+    invalidate_links([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=UploadedImage)
+@receiver([post_save, post_delete], sender=ImagePreset)
+def invalidate_related_link_entries(sender, instance, **kwargs):
+    # Links cache their image and preset once, however many links share them.
+    invalidate_related(instance)
+
+
+@receiver(pre_save, sender=ImagePreset)
+def remember_preset(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance.saved = ImagePreset.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=ImagePreset)
+def purge_changed_preset(sender, instance, **kwargs):
+    # Rendition keys follow the preset, so renditions of its previous
+    # settings can't be served anymore and only take up space. Purging them
+    # touches every image of the preset, so it doesn't hold up the save.
+    saved = getattr(instance, "saved", None)
+    if saved is not None and saved.spec != instance.spec:
+        transaction.on_commit(lambda: run_in_background(purge_preset_renditions, saved))
+
+
+@receiver(post_save, sender=UploadedImage)
+def purge_replaced_image(sender, instance, **kwargs):
+    replaced = getattr(instance, "replaced", None)
+    if replaced is not None:
+        del instance.replaced
+        presets = list(ImagePreset.objects.filter(imageurl__image=instance).distinct())
+        transaction.on_commit(lambda: purge_image_renditions(replaced, presets))
+
+
+@receiver(pre_delete, sender=UploadedImage)
+def remember_image_presets(sender, instance, **kwargs):
+    instance.rendition_presets = list(
+        ImagePreset.objects.filter(imageurl__image=instance).distinct()
+    )
+
+
+@receiver(post_delete, sender=UploadedImage)
+def purge_deleted_image(sender, instance, **kwargs):
+    presets = getattr(instance, "rendition_presets", [])
+    transaction.on_commit(lambda: purge_image_renditions(instance, presets))
@@ -0,0 +1,77 @@
+from unittest.mock import MagicMock, patch
+
+from common.cache import LocalCache, TieredCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+
+class TestLocalCache(SimpleTestCase):
+    def test_least_recently_used_entries_are_evicted_past_max_size(self):
+        cache = LocalCache(10)
+        cache.set("a", b"1234", 60)
+        cache.set("b", b"1234", 60)
+        cache.get("a")
+        cache.set("c", b"1234", 60)
+        self.assertEqual(cache.get("a"), b"1234")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), b"1234")
+        self.assertEqual(cache.stats(), {"entries": 2, "bytes": 8, "evictions": 1})
+
+    def test_values_larger_than_the_cache_are_not_kept(self):
+        cache = LocalCache(10)
+        cache.set("a", b"1234", 60)
+        cache.set("a", b"12345678901", 60)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_entries_expire(self):
+        cache = LocalCache(100)
+        with patch("common.cache.time.monotonic", return_value=100):
+            cache.set("a", {"pickled": "size"}, 60)
+        with patch("common.cache.time.monotonic", return_value=159):
+            self.assertEqual(cache.get("a"), {"pickled": "size"})
+        with patch("common.cache.time.monotonic", return_value=160):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+@override_settings(TEST_LOCAL_CACHE_SIZE=1024, LOCAL_CACHE_TIMEOUT=60)
+class TestTieredCache(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocMemCache("tiered", {})
+        self.shared.clear()
+        self.cache = TieredCache(self.shared, "TEST_LOCAL_CACHE_SIZE")
+
+    def test_shared_hits_are_kept_locally(self):
+        self.shared.set("key", b"value")
+        self.assertEqual(self.cache.get_tiered("key"), (b"value", "cache"))
+        self.assertEqual(self.cache.get("key"), b"value")
+        self.assertEqual(self.cache.get_tiered("key"), (b"value", "local"))
+
+    def test_local_entries_honor_shorter_timeouts(self):
+        self.cache.set_local("key", b"value", timeout=0)
+        self.assertEqual(self.cache.get_tiered("key"), (None, None))
+
+        self.cache.local = MagicMock()
+        self.cache.set("key", b"value", timeout=30)
+        self.cache.local.set.assert_called_with("key", b"value", 30)
+        self.cache.set("key", b"value", local_timeout=600)
+        self.cache.local.set.assert_called_with("key", b"value", 60)
+
+    def test_deletes_reach_both_tiers(self):
+        self.cache.set("a", b"a")
+        self.cache.set("b", b"b")
+        self.cache.delete("a")
+        self.cache.delete_many(["b"])
+        self.assertEqual(self.cache.get_tiered("a"), (None, None))
+        self.assertEqual(self.cache.get_tiered("b"), (None, None))
+
+        self.cache.set("c", b"c")
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key("c"))
+
+    @override_settings(TEST_LOCAL_CACHE_SIZE=0)
+    def test_local_tier_can_be_disabled(self):
+        self.cache.set("key", b"value")
+        self.assertEqual(self.cache.get_tiered("key"), (b"value", "cache"))
+        self.assertEqual(self.cache.local.stats()["entries"], 0)
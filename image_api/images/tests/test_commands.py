@@ -0,0 +1,200 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from accounts.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from images.models import ImagePreset, ImageUrl, UploadedImage
+from images.renditions import get_rendition, get_rendition_storage, rendition_cache
+from images.tests.utils import TemporaryMediaMixin
+
+image_path = Path(__file__).parent / "files" / "sample_image.png"
+
+
+class TestBackfillImageMetadata(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def test_populates_missing_metadata(self):
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=User.objects.first(),
+        )
+        content_hash = image.content_hash
+        UploadedImage.objects.update(
+            content_hash="", width=None, height=None, format="", mime_type=""
+        )
+
+        out = StringIO()
+        call_command("backfill_image_metadata", stdout=out)
+
+        image.refresh_from_db()
+        self.assertEqual(image.content_hash, content_hash)
+        self.assertEqual((image.width, image.height), (1920, 1920))
+        self.assertEqual((image.format, image.mime_type), ("PNG", "image/png"))
+        self.assertIn("Updated 1 images", out.getvalue())
+
+
+class TestReapExpiredLinks(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=User.objects.first(),
+        )
+        self.presets = ImagePreset.objects.exclude(height=None)[:2]
+        rendition_cache.clear()
+
+    def create_link(self, preset, expire):
+        image_url = ImageUrl.objects.create(
+            preset=preset, image=self.image, expire=expire
+        )
+        get_rendition(image_url).close()
+        return image_url
+
+    def test_deletes_expired_links_and_unused_renditions(self):
+        first, second = self.presets
+        expired = self.create_link(first, 300)
+        shared = self.create_link(second, 300)
+        active = self.create_link(second, None)
+        ImageUrl.objects.filter(pk__in=[expired.pk, shared.pk]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        out = StringIO()
+        call_command("reap_expired_links", "--batch-size=1", stdout=out)
+
+        self.assertEqual(list(ImageUrl.objects.all()), [active])
+        self.assertIn("Deleted 2 expired links and 1 renditions", out.getvalue())
+        self.assertFalse(rendition_cache.has_key(expired.rendition_key))
+        self.assertFalse(get_rendition_storage().exists(expired.rendition_path))
+        self.assertTrue(rendition_cache.has_key(active.rendition_key))
+
+    def expire(self, image_url):
+        ImageUrl.objects.filter(pk=image_url.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def assertRenditionKept(self, image_url):
+        self.assertTrue(rendition_cache.has_key(image_url.rendition_key))
+        self.assertTrue(get_rendition_storage().exists(image_url.rendition_path))
+
+    def test_keeps_renditions_of_identical_presets(self):
+        preset = self.presets[0]
+        twin = ImagePreset.objects.create(name="twin", height=preset.height)
+        expired = self.create_link(preset, 300)
+        ImageUrl.objects.create(preset=twin, image=self.image)
+        self.expire(expired)
+
+        out = StringIO()
+        call_command("reap_expired_links", stdout=out)
+
+        self.assertIn("Deleted 1 expired links and 0 renditions", out.getvalue())
+        self.assertRenditionKept(expired)
+
+    def test_keeps_renditions_of_duplicate_uploads(self):
+        preset = self.presets[0]
+        expired = self.create_link(preset, 300)
+        duplicate = UploadedImage.objects.create(
+            image=SimpleUploadedFile("copy.png", image_path.read_bytes()),
+            user=self.image.user,
+        )
+        ImageUrl.objects.create(preset=preset, image=duplicate)
+        self.expire(expired)
+
+        out = StringIO()
+        call_command("reap_expired_links", stdout=out)
+
+        self.assertIn("Deleted 1 expired links and 0 renditions", out.getvalue())
+        self.assertRenditionKept(expired)
+
+
+class TestBenchmarkImageView(TemporaryMediaMixin, TransactionTestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def test_reports_both_servers_and_cleans_up(self):
+        out = StringIO()
+        call_command(
+            "benchmark_image_view",
+            "--requests=2",
+            "--concurrency=2",
+            "--size",
+            "64",
+            "48",
+            stdout=out,
+        )
+        scenarios = [line.split()[:2] for line in out.getvalue().splitlines()[1:]]
+        self.assertEqual(
+            scenarios,
+            [["wsgi", "hit"], ["wsgi", "miss"], ["asgi", "hit"], ["asgi", "miss"]],
+        )
+        self.assertFalse(UploadedImage.objects.exists())
+        self.assertFalse(ImageUrl.objects.exists())
+
+
+class TestRunBenchmarks(TemporaryMediaMixin, TestCase):
+    def test_reports_every_scenario_as_json_and_cleans_up(self):
+        out = StringIO()
+        call_command(
+            "run_benchmarks",
+            "--sizes=64x48",
+            "--formats=jpeg,png",
+            "--account-sizes=3",
+            "--iterations=2",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(
+            [(result["name"], result["iterations"]) for result in report["results"]],
+            [("render", 2), ("serve_hit", 2), ("serve_miss", 2), ("upload", 2)] * 2
+            + [("list", 2)],
+        )
+        serve_hit = report["results"][1]
+        self.assertEqual(serve_hit["queries_per_request"], 0)
+        self.assertFalse(UploadedImage.objects.exists())
+        self.assertFalse(ImagePreset.objects.exists())
+
+
+class TestPurgeRenditions(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        rendition_cache.clear()
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=User.objects.first(),
+        )
+        self.preset = ImagePreset.objects.exclude(height=None).first()
+        self.image_url = ImageUrl.objects.create(preset=self.preset, image=image)
+        get_rendition(self.image_url).close()
+
+    def test_purges_renditions(self):
+        out = StringIO()
+        call_command("purge_renditions", self.preset.pk, stdout=out)
+        self.assertIn("Purged the renditions of 1 images.", out.getvalue())
+        self.assertFalse(rendition_cache.has_key(self.image_url.rendition_key))
+        self.assertFalse(get_rendition_storage().exists(self.image_url.rendition_path))
+
+    def test_bumps_version_and_warms(self):
+        old_key = self.image_url.rendition_key
+        out = StringIO()
+        call_command(
+            "purge_renditions", self.preset.pk, "--bump-version", "--warm", stdout=out
+        )
+        self.assertIn("now at version 2", out.getvalue())
+        self.assertIn("Rendered 1 renditions (0 too large).", out.getvalue())
+
+        image_url = ImageUrl.objects.get(pk=self.image_url.pk)
+        self.assertTrue(image_url.rendition_key.endswith("-v2.png"))
+        self.assertTrue(rendition_cache.has_key(image_url.rendition_key))
+        self.assertFalse(rendition_cache.has_key(old_key))
+
+    def test_unknown_preset(self):
+        with self.assertRaises(CommandError):
+            call_command("purge_renditions", 0)
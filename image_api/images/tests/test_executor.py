@@ -0,0 +1,67 @@
+import threading
+from unittest import TestCase
+
+from images.executor import RenderExecutor, RenderQueueFull
+
+
+class TestRenderExecutor(TestCase):
+    def setUp(self):
+        self.executor = RenderExecutor(
+            "thread", workers=1, queue_size=4, user_queue_size=3, retry_after=7
+        )
+        self.release = threading.Event()
+        self.order = []
+
+    def tearDown(self):
+        self.release.set()
+        self.executor.pool.shutdown()
+
+    def job(self, name):
+        self.release.wait(5)
+        self.order.append(name)
+        return name
+
+    def test_queued_jobs_are_dispatched_round_robin_across_users(self):
+        futures = [self.executor.submit("a", self.job, "a0")]
+        futures += [self.executor.submit("a", self.job, f"a{i}") for i in [1, 2, 3]]
+        futures.append(self.executor.submit("b", self.job, "b1"))
+
+        self.release.set()
+        self.assertEqual(
+            [future.result(5) for future in futures], ["a0", "a1", "a2", "a3", "b1"]
+        )
+        self.assertEqual(self.order, ["a0", "a1", "b1", "a2", "a3"])
+
+    def test_submit_raises_when_the_queue_is_full(self):
+        self.executor.submit("a", self.job, "running")
+        for i in range(3):
+            self.executor.submit("a", self.job, i)
+        with self.assertRaises(RenderQueueFull) as cm:
+            self.executor.submit("a", self.job, "one too many for a")
+        self.assertEqual(cm.exception.retry_after, 7)
+
+        self.executor.submit("b", self.job, "b")
+        with self.assertRaises(RenderQueueFull):
+            self.executor.submit("c", self.job, "one too many")
+
+    def test_stats_report_queue_depth_and_renders(self):
+        self.executor.submit("a", self.job, "running")
+        last = self.executor.submit("b", self.job, "queued")
+        stats = self.executor.stats()
+        self.assertEqual((stats["running"], stats["queued"]), (1, 1))
+
+        self.release.set()
+        last.result(5)
+        stats = self.executor.stats()
+        self.assertEqual((stats["running"], stats["queued"]), (0, 0))
+        self.assertEqual(stats["renders"], 2)
+
+    def test_failures_are_returned_and_free_the_worker(self):
+        def fail():
+            raise ValueError("broken image")
+
+        failed = self.executor.submit("a", fail)
+        with self.assertRaises(ValueError):
+            failed.result(5)
+        self.release.set()
+        self.assertEqual(self.executor.submit("a", self.job, "next").result(5), "next")
@@ -0,0 +1,127 @@
+from http import HTTPStatus
+from pathlib import Path
+
+from accounts.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from images import metrics
+from images.models import ImagePreset, ImageUrl, UploadedImage
+from images.renditions import rendition_cache
+from images.tests.utils import TemporaryMediaMixin
+
+image_path = Path(__file__).parent / "files" / "sample_image.png"
+
+
+class TestRegistry(TestCase):
+    def test_exposition(self):
+        registry = metrics.Registry()
+        registry.increment("rendition_lookups_total", (("result", "cache"),))
+        registry.increment("rendition_lookups_total", (("result", "cache"),), 2)
+        registry.observe("render_encode_seconds", 0.003)
+        registry.observe("render_encode_seconds", 20)
+
+        exposition = registry.exposition(
+            [
+                ("render_pool_queued", (), 4),
+                ("local_cache_bytes", (("cache", "links"),), 9),
+            ]
+        )
+
+        self.assertIn("# TYPE rendition_lookups_total counter", exposition)
+        self.assertIn('rendition_lookups_total{result="cache"} 3', exposition)
+        self.assertIn("# TYPE render_encode_seconds histogram", exposition)
+        self.assertIn('render_encode_seconds_bucket{le="0.0025"} 0', exposition)
+        self.assertIn('render_encode_seconds_bucket{le="0.005"} 1', exposition)
+        self.assertIn('render_encode_seconds_bucket{le="10"} 1', exposition)
+        self.assertIn('render_encode_seconds_bucket{le="+Inf"} 2', exposition)
+        self.assertIn("render_encode_seconds_sum 20.003", exposition)
+        self.assertIn("render_encode_seconds_count 2", exposition)
+        self.assertIn("# TYPE render_pool_queued gauge", exposition)
+        self.assertIn("render_pool_queued 4", exposition)
+        self.assertIn('local_cache_bytes{cache="links"} 9', exposition)
+
+    def test_label_values_are_escaped(self):
+        self.assertEqual(
+            metrics.format_labels((("view", 'a"b\\c'),)), '{view="a\\"b\\\\c"}'
+        )
+
+    def test_recording_is_a_noop_when_disabled(self):
+        metrics.registry.clear()
+        metrics.increment("rendition_lookups_total", (("result", "cache"),))
+        with metrics.timer("rendition_cache_get_seconds"):
+            pass
+        self.assertEqual(metrics.registry.counters, {})
+        self.assertEqual(metrics.registry.histograms, {})
+
+
+class TestMetrics(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=User.objects.first(),
+        )
+        self.image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.first(), image=image
+        )
+        self.url = reverse("image-url-view", args=[self.image_url.id])
+        rendition_cache.clear()
+        metrics.registry.clear()
+        # The test connection was opened before the middleware hooked into
+        # new connections.
+        metrics.install()
+
+    @override_settings(METRICS_ENABLED=True, METRICS_SERVER_TIMING=True)
+    def test_serving_records_metrics(self):
+        res = self.client.get(self.url)
+        b"".join(res.streaming_content)
+
+        timings = res["Server-Timing"]
+        for name in ["link", "cache", "decode", "resize", "encode", "db", "total"]:
+            self.assertIn(f"{name};dur=", timings)
+        self.assertRegex(timings, r'desc="[1-9]\d* queries"')
+
+        self.client.get(self.url)
+        res = self.client.get(reverse("metrics"))
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            res["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+        exposition = res.content.decode()
+        self.assertIn('rendition_lookups_total{result="miss"} 1', exposition)
+        self.assertIn('rendition_lookups_total{result="local"} 1', exposition)
+        self.assertIn('rendition_renders_total{result="rendered"} 1', exposition)
+        self.assertIn("render_decode_seconds_count 1", exposition)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="image-url-view"} 2', exposition
+        )
+        self.assertIn('http_response_bytes_total{view="image-url-view"}', exposition)
+        self.assertIn('db_queries_total{view="image-url-view"}', exposition)
+        self.assertIn("render_pool_workers", exposition)
+        self.assertIn('local_cache_entries{cache="renditions"} 1', exposition)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_SERVER_TIMING=True)
+    async def test_asgi_requests_are_recorded(self):
+        res = await AsyncClient().get(self.url)
+        self.assertIn("link;dur=", res["Server-Timing"])
+        self.assertRegex(res["Server-Timing"], r'desc="[1-9]\d* queries"')
+        self.assertIn(
+            (("view", "image-url-view"),),
+            {labels for _, labels in metrics.registry.histograms},
+        )
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_server_timing_is_opt_in(self):
+        res = self.client.get(self.url)
+        self.assertNotIn("Server-Timing", res)
+
+    def test_disabled(self):
+        res = self.client.get(self.url)
+        self.assertNotIn("Server-Timing", res)
+        self.assertEqual(metrics.registry.counters, {})
+
+        res = self.client.get(reverse("metrics"))
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,131 @@
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from accounts.models import Plan, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from images.models import ImageUrl, UploadedImage
+from images.prerender import prerender_image
+from images.renditions import render_renditions, rendition_cache
+from images.tests.utils import TemporaryMediaMixin
+from PIL import Image
+
+image_path = Path(__file__).parent / "files" / "sample_image.png"
+
+
+class TestPrerender(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(
+            username="premium_user", plan=Plan.objects.get(name="Premium")
+        )
+        self.client.force_login(self.user)
+        rendition_cache.clear()
+
+    def _cached_renditions(self, filetype=None):
+        # The last preset is "Original", which is served without a rendition.
+        return [
+            rendition_cache.has_key(
+                image_url.image.rendition_key(image_url.preset, filetype)
+            )
+            for image_url in ImageUrl.objects.select_related("image", "preset")
+        ]
+
+    @override_settings(RENDITION_PRERENDER=True, RENDITION_PRERENDER_BACKEND="sync")
+    def test_upload_prerenders_all_presets(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(image_path, "rb") as img:
+                self.client.post(reverse("images-list"), {"image": img})
+        self.assertEqual(self._cached_renditions(), [True, True, False])
+
+    @override_settings(RENDITION_PRERENDER=True, RENDITION_PRERENDER_BACKEND="sync")
+    def test_sync_prerender_logs_unreadable_uploads(self):
+        content = image_path.read_bytes()
+        with self.assertLogs(level="WARNING") as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    reverse("images-list"),
+                    {
+                        "image": SimpleUploadedFile(
+                            "cut.png", content[: len(content) // 3]
+                        )
+                    },
+                )
+        self.assertEqual(res.status_code, 201)
+        self.assertIn("could not be decoded", logs.output[0])
+
+    @override_settings(
+        RENDITION_PRERENDER=True,
+        RENDITION_PRERENDER_BACKEND="sync",
+        RENDITION_FORMATS=["webp"],
+    )
+    def test_negotiated_formats_are_prerendered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(image_path, "rb") as img:
+                self.client.post(reverse("images-list"), {"image": img})
+        self.assertEqual(self._cached_renditions("webp"), [True, True, False])
+
+        image_url = ImageUrl.objects.exclude(preset__name="Original").first()
+        with patch("images.rendering.render_timed") as render_timed:
+            res = self.client.get(
+                reverse("image-url-view", args=[image_url.id]),
+                HTTP_ACCEPT="image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+            )
+        render_timed.assert_not_called()
+        self.assertEqual(res["Content-Type"], "image/webp")
+
+    @override_settings(RENDITION_FORMATS=["webp"])
+    def test_process_backend_prerenders_negotiated_formats(self):
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=self.user,
+        )
+        for preset in self.user.plan.presets.all():
+            ImageUrl.objects.create(preset=preset, image=image)
+        for future in prerender_image(image, "process"):
+            future.result()
+        self.assertEqual(self._cached_renditions(), [True, True, False])
+        self.assertEqual(self._cached_renditions("webp"), [True, True, False])
+
+    @override_settings(RENDITION_PRERENDER=True, RENDITION_PRERENDER_BACKEND="thread")
+    def test_thread_backend_prerenders_all_presets(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with open(image_path, "rb") as img:
+                self.client.post(reverse("images-list"), {"image": img})
+        for future in prerender_image(UploadedImage.objects.get()):
+            future.result()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self._cached_renditions(), [True, True, False])
+
+    def test_upload_does_not_prerender_by_default(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with open(image_path, "rb") as img:
+                self.client.post(reverse("images-list"), {"image": img})
+        self.assertEqual(self._cached_renditions(), [False, False, False])
+
+    def test_backfill_command_renders_existing_images(self):
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=self.user,
+        )
+        for preset in self.user.plan.presets.all():
+            ImageUrl.objects.create(preset=preset, image=image)
+
+        call_command("prerender_renditions", stdout=StringIO())
+        self.assertEqual(self._cached_renditions(), [True, True, False])
+
+    def test_render_renditions_decodes_original_once(self):
+        image = UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=self.user,
+        )
+        presets = list(self.user.plan.presets.all())
+        with patch("images.rendering.Image.open", wraps=Image.open) as image_open:
+            rendered = render_renditions(image, presets)
+        image_open.assert_called_once()
+        self.assertEqual(set(rendered), set(presets))
@@ -0,0 +1,176 @@
+from decimal import Decimal
+from io import BytesIO
+from unittest import TestCase
+from unittest.mock import patch
+
+from images import rendering
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+
+def open_image(size, format):
+    img_data = BytesIO()
+    Image.new("RGB", size, "red").save(img_data, format)
+    img_data.seek(0)
+    return Image.open(img_data)
+
+
+class TestApplyPreset(TestCase):
+    def test_height_preset_keeps_aspect_ratio(self):
+        img = open_image((3000, 2000), "png")
+        img = rendering.apply_preset(img, None, Decimal("200.00"))
+        self.assertEqual(img.size, (300, 200))
+
+    def test_width_preset_keeps_aspect_ratio(self):
+        img = open_image((3000, 2000), "png")
+        img = rendering.apply_preset(img, Decimal("150.00"), None)
+        self.assertEqual(img.size, (150, 100))
+
+    def test_empty_preset_returns_original(self):
+        img = open_image((300, 200), "png")
+        self.assertIs(rendering.apply_preset(img, None, None), img)
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        img = open_image((3000, 2000), "jpeg")
+        with patch.object(JpegImageFile, "draft", wraps=img.draft) as draft:
+            resized = rendering.apply_preset(img, None, Decimal("200.00"))
+        draft.assert_called_once_with("RGB", (300, 200))
+        self.assertEqual(img.size, (375, 250))
+        self.assertEqual(resized.size, (300, 200))
+
+    def test_pixel_budget_is_checked_before_decoding(self):
+        img = open_image((3000, 2000), "png")
+        with patch.object(img, "load") as load:
+            with self.assertRaises(rendering.ImageTooLarge):
+                rendering.apply_presets(
+                    img, [(None, Decimal("200.00"), rendering.FIT)], max_pixels=10**6
+                )
+        load.assert_not_called()
+
+    def test_pixel_budget_applies_to_the_reduced_jpeg_decode(self):
+        img = open_image((3000, 2000), "jpeg")
+        geometry = (None, Decimal("200.00"), rendering.FIT)
+        resized = rendering.apply_presets(img, [geometry], max_pixels=10**5)
+        self.assertEqual(resized[geometry].size, (300, 200))
+
+    def test_render_refuses_decompression_bombs(self):
+        img_data = BytesIO()
+        Image.new("1", (20000, 20000)).save(img_data, "png")
+        img_data.seek(0)
+        with self.assertRaises(rendering.ImageTooLarge):
+            rendering.render(
+                img_data, {((None, 200, rendering.FIT), (None,) * 3)}, "png"
+            )
+
+
+class TestTargetGeometry(TestCase):
+    def test_fit_scales_inside_the_box(self):
+        geometry = rendering.target_geometry((3000, 2000), 200, 200, rendering.FIT)
+        self.assertEqual(geometry, ((200, 133), None))
+
+    def test_fill_covers_the_box_and_crops_the_centre(self):
+        geometry = rendering.target_geometry((3000, 2000), 200, 200, rendering.FILL)
+        self.assertEqual(geometry, ((300, 200), (50, 0, 250, 200)))
+        self.assertEqual(
+            rendering.target_size((3000, 2000), 200, 200, rendering.FILL), (200, 200)
+        )
+
+    def test_exact_stretches_to_the_box(self):
+        geometry = rendering.target_geometry((3000, 2000), 200, 200, rendering.EXACT)
+        self.assertEqual(geometry, ((200, 200), None))
+
+    def test_single_dimension_keeps_aspect_ratio_in_every_mode(self):
+        for fit in [rendering.FIT, rendering.FILL, rendering.EXACT]:
+            geometry = rendering.target_geometry((3000, 2000), None, 400, fit)
+            self.assertEqual(geometry, ((600, 400), None))
+
+    def test_extreme_aspect_ratios_keep_at_least_one_pixel(self):
+        size = (4000, 10)
+        self.assertEqual(rendering.target_geometry(size, 200, None), ((200, 1), None))
+        self.assertEqual(
+            rendering.target_geometry(size, 200, 200, rendering.FIT), ((200, 1), None)
+        )
+        self.assertEqual(
+            rendering.target_geometry((10, 4000), None, 200), ((1, 200), None)
+        )
+        self.assertEqual(
+            rendering.target_geometry(size, 200, 1, rendering.FILL),
+            ((400, 1), (100, 0, 300, 1)),
+        )
+        self.assertEqual(
+            rendering.target_geometry(size, Decimal("0.4"), 1, rendering.EXACT),
+            ((1, 1), None),
+        )
+
+
+class TestApplyPresets(TestCase):
+    def test_fill_crops_to_the_exact_box(self):
+        img = open_image((3000, 2000), "png")
+        img = rendering.apply_preset(img, 200, 200, rendering.FILL)
+        self.assertEqual(img.size, (200, 200))
+
+    def test_extreme_aspect_ratios_render(self):
+        img = open_image((4000, 10), "png")
+        img = rendering.apply_preset(img, 200, None)
+        self.assertEqual(img.size, (200, 1))
+
+    def test_renders_every_geometry(self):
+        img = open_image((3000, 2000), "png")
+        geometries = [
+            (None, Decimal("200"), rendering.FIT),
+            (None, Decimal("400"), rendering.FIT),
+            (None, None, rendering.FIT),
+        ]
+        results = rendering.apply_presets(img, geometries)
+        self.assertEqual(
+            [results[geometry].size for geometry in geometries],
+            [(300, 200), (600, 400), (3000, 2000)],
+        )
+
+    def test_smaller_renditions_are_derived_from_larger_ones(self):
+        img = open_image((3000, 2000), "jpeg")
+        resize = Image.Image.resize
+        calls = []
+
+        def recording_resize(source, *args, **kwargs):
+            resized = resize(source, *args, **kwargs)
+            calls.append((source, resized))
+            return resized
+
+        with patch.object(Image.Image, "resize", recording_resize):
+            with patch.object(JpegImageFile, "draft", wraps=img.draft) as draft:
+                rendering.apply_presets(
+                    img,
+                    [
+                        (None, Decimal("200"), rendering.FIT),
+                        (None, Decimal("400"), rendering.FIT),
+                    ],
+                )
+        draft.assert_called_once_with("RGB", (600, 400))
+        (first_source, large), (second_source, small) = calls
+        self.assertIs(first_source, img)
+        self.assertIs(second_source, large)
+        self.assertEqual((large.size, small.size), ((600, 400), (300, 200)))
+
+
+class TestEncode(TestCase):
+    def test_quality_is_passed_to_the_encoder(self):
+        img = Image.effect_noise((200, 200), 64).convert("RGB")
+        high = rendering.encode(img, "jpeg", quality=95)
+        low = rendering.encode(img, "jpeg", quality=20, optimize=True)
+        self.assertLess(len(low), len(high))
+
+    def test_progressive_jpeg(self):
+        img = Image.new("RGB", (64, 64), "red")
+        encoded = rendering.encode(img, "jpeg", progressive=True)
+        self.assertTrue(Image.open(BytesIO(encoded)).info.get("progressive"))
+
+    def test_render_encodes_each_spec(self):
+        path = BytesIO()
+        Image.new("RGB", (300, 200), "red").save(path, "png")
+        geometry = (None, 100, rendering.FIT)
+        specs = {(geometry, (None, False, False)), (geometry, (50, False, False))}
+        rendered = rendering.render(path, specs, "webp")
+        self.assertEqual(set(rendered), specs)
+        for data in rendered.values():
+            self.assertEqual(Image.open(BytesIO(data)).size, (150, 100))
@@ -0,0 +1,104 @@
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+from accounts.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from images.models import ImagePreset, ImageUrl, UploadedImage
+from images.renditions import (
+    get_rendition,
+    get_rendition_storage,
+    purge_preset_renditions,
+    rendition_cache,
+)
+from images.tests.utils import TemporaryMediaMixin
+from PIL import Image
+
+image_path = Path(__file__).parent / "files" / "sample_image.png"
+
+
+@override_settings(RENDITION_PRERENDER_BACKEND="sync")
+class TestRenditionPurging(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        rendition_cache.clear()
+        self.user = User.objects.first()
+        self.preset = ImagePreset.objects.exclude(height=None).first()
+        self.image = self.create_image()
+        self.image_url = self.render(self.image)
+        self.key = self.image_url.rendition_key
+        self.path = self.image_url.rendition_path
+
+    def create_image(self):
+        return UploadedImage.objects.create(
+            image=SimpleUploadedFile("sample_image.png", image_path.read_bytes()),
+            user=self.user,
+        )
+
+    def render(self, image):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=image)
+        get_rendition(image_url).close()
+        return image_url
+
+    def assertRendered(self, rendered=True):
+        self.assertEqual(rendition_cache.has_key(self.key), rendered)
+        self.assertEqual(get_rendition_storage().exists(self.path), rendered)
+
+    def test_changing_a_preset_purges_its_previous_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preset.height = 50
+            self.preset.save()
+        self.assertRendered(False)
+
+    @override_settings(RENDITION_PRERENDER_BACKEND="thread")
+    def test_preset_purges_run_in_the_background(self):
+        with patch("images.prerender.get_executor") as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.preset.height = 50
+                self.preset.save()
+        get_executor.assert_called_once_with("thread")
+        _, func, saved = get_executor.return_value.submit.call_args.args
+        self.assertIs(func, purge_preset_renditions)
+        self.assertEqual(saved.height, 200)
+        self.assertRendered()
+
+    def test_renaming_a_preset_keeps_its_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.preset.name = "renamed"
+            self.preset.save()
+        self.assertEqual(callbacks, [])
+        self.assertRendered()
+
+    def test_renditions_shared_with_an_identical_preset_are_kept(self):
+        twin = ImagePreset.objects.create(name="twin", height=self.preset.height)
+        ImageUrl.objects.create(preset=twin, image=self.image)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preset.height = 50
+            self.preset.save()
+        self.assertRendered()
+
+    def test_deleting_an_image_purges_its_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.delete()
+        self.assertRendered(False)
+
+    def test_renditions_of_duplicate_images_are_kept(self):
+        self.render(self.create_image())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.delete()
+        self.assertRendered()
+
+    def test_replacing_an_image_file_purges_its_renditions(self):
+        image = UploadedImage.objects.get(pk=self.image.pk)
+        content_hash = image.content_hash
+        img_data = BytesIO()
+        Image.new("RGB", (640, 480), "red").save(img_data, "png")
+        with self.captureOnCommitCallbacks(execute=True):
+            image.image = SimpleUploadedFile("other.png", img_data.getvalue())
+            image.save()
+        self.assertNotEqual(image.content_hash, content_hash)
+        self.assertEqual((image.width, image.height), (640, 480))
+        self.assertRendered(False)
@@ -1,14 +1,39 @@
+import tarfile
 import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from http import HTTPStatus
+from io import BytesIO
 from pathlib import Path
 from unittest.mock import patch
 
 from accounts.models import Plan, User
+from asgiref.sync import sync_to_async
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import Http404
 from django.http.response import FileResponse
-from django.test import TestCase
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from images import rendering
+from images.bulk import spool
+from images.executor import RenderQueueFull
+from images.links import invalidate_links, link_cache, lookup_link
 from images.models import ImagePreset, ImageUrl, UploadedImage
+from images.renditions import rendition_cache
+from images.tests.utils import BytesSerializingCache, TemporaryMediaMixin
+from images.views import AsyncImageUrlView
+from PIL import Image
 
 image_path = Path(__file__).parent / "files" / "sample_image.png"
 sample_image = SimpleUploadedFile(
@@ -18,14 +43,16 @@ sample_image = SimpleUploadedFile(
 )
 
 
-class TestImageUrlView(TestCase):
+class TestImageUrlView(TemporaryMediaMixin, TestCase):
     fixtures = ["fixtures/initial_data.json"]
 
     def setUp(self):
+        super().setUp()
         self.preset = ImagePreset.objects.first()
         self.image = UploadedImage.objects.create(
             image=sample_image, user=User.objects.first()
         )
+        rendition_cache.clear()
 
     def test_non_get_requests_are_not_allowed(self):
         url = reverse("image-url-view", args=[1])
@@ -35,9 +62,6 @@ class TestImageUrlView(TestCase):
         res = self.client.put(url)
         self.assertEqual(res.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
 
-        res = self.client.head(url)
-        self.assertEqual(res.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
-
         res = self.client.options(url)
         self.assertEqual(res.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
 
@@ -48,12 +72,235 @@ class TestImageUrlView(TestCase):
         self.assertEqual(res.status_code, HTTPStatus.OK)
         self.assertIsInstance(res, FileResponse)
 
+    def test_head_returns_headers_without_body(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        res = self.client.head(reverse("image-url-view", args=[image_url.id]))
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertIn("ETag", res)
+        self.assertEqual(b"".join(res.streaming_content), b"")
+
+    def test_matching_etag_returns_not_modified(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        etag = self.client.get(url)["ETag"]
+        with patch("images.views.get_rendition") as get_rendition:
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+        get_rendition.assert_not_called()
+
+    def test_if_modified_since_returns_not_modified(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_replacing_the_file_changes_last_modified(self):
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        UploadedImage.objects.filter(pk=self.image.pk).update(
+            created_at=an_hour_ago, updated_at=an_hour_ago
+        )
+        ImagePreset.objects.filter(pk=self.preset.pk).update(updated_at=an_hour_ago)
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        last_modified = self.client.get(url)["Last-Modified"]
+
+        image = UploadedImage.objects.get(pk=self.image.pk)
+        img_data = BytesIO()
+        Image.new("RGB", (640, 480), "red").save(img_data, "png")
+        image.image = SimpleUploadedFile("other.png", img_data.getvalue())
+        image.save()
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertNotEqual(res["Last-Modified"], last_modified)
+
+    def test_links_to_same_rendition_share_etag(self):
+        first_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        second_url = ImageUrl.objects.create(
+            preset=self.preset, image=self.image, expire=300
+        )
+        first = self.client.get(reverse("image-url-view", args=[first_url.id]))
+        second = self.client.get(reverse("image-url-view", args=[second_url.id]))
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_cache_control_follows_link_expiry(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        self.assertIn("immutable", res["Cache-Control"])
+
+        image_url = ImageUrl.objects.create(
+            preset=self.preset, image=self.image, expire=300
+        )
+        res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        self.assertNotIn("immutable", res["Cache-Control"])
+        self.assertRegex(res["Cache-Control"], r"max-age=(299|300)\b")
+
+    def test_cache_hit_does_not_touch_the_original(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        self.client.get(url)
+        with patch("images.models.mimetypes.guess_type") as guess_type, patch(
+            "images.rendering.Image.open"
+        ) as image_open:
+            res = self.client.get(url)
+        guess_type.assert_not_called()
+        image_open.assert_not_called()
+        self.assertEqual(res["Content-Type"], "image/png")
+
+    def test_accept_header_negotiates_webp(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        png = self.client.get(url, HTTP_ACCEPT="image/*,*/*;q=0.8")
+        webp = self.client.get(url, HTTP_ACCEPT="image/webp,image/*,*/*;q=0.8")
+
+        self.assertEqual(png["Content-Type"], "image/png")
+        self.assertEqual(webp["Content-Type"], "image/webp")
+        self.assertEqual(webp["Vary"], "Accept")
+        self.assertNotEqual(png["ETag"], webp["ETag"])
+        self.assertIn(".webp", webp["Content-Disposition"])
+        content = b"".join(webp.streaming_content)
+        self.assertEqual(Image.open(BytesIO(content)).format, "WEBP")
+        image_url.filetype = "webp"
+        self.assertEqual(rendition_cache.get(image_url.rendition_key), content)
+
+    @override_settings(RENDITION_FORMATS=["avif", "webp"])
+    def test_unsupported_formats_are_skipped(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        with patch("images.rendering.can_encode", side_effect=lambda t: t != "avif"):
+            res = self.client.get(url, HTTP_ACCEPT="image/avif,image/webp")
+        self.assertEqual(res["Content-Type"], "image/webp")
+
+    def test_originals_are_not_negotiated(self):
+        image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.get(name="Original"), image=self.image
+        )
+        res = self.client.get(
+            reverse("image-url-view", args=[image_url.id]), HTTP_ACCEPT="image/webp"
+        )
+        self.assertEqual(res["Content-Type"], "image/png")
+        self.assertNotIn("Vary", res)
+
+    def test_preset_encoding_gets_its_own_rendition(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        key = image_url.rendition_key
+        self.preset.quality = 40
+        self.preset.save()
+        image_url = ImageUrl.objects.select_related("preset").get(pk=image_url.pk)
+        self.assertNotEqual(image_url.rendition_key, key)
+
+    def test_original_size_preset_serves_the_original_file(self):
+        image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.get(name="Original"), image=self.image
+        )
+        url = reverse("image-url-view", args=[image_url.id])
+        with patch("images.rendering.Image.open") as image_open:
+            self._test_log_message(url, "Serving original")
+        image_open.assert_not_called()
+        res = self.client.get(url)
+        self.assertEqual(b"".join(res.streaming_content), image_path.read_bytes())
+
+    def test_range_request_returns_partial_content(self):
+        image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.get(name="Original"), image=self.image
+        )
+        url = reverse("image-url-view", args=[image_url.id])
+        content = image_path.read_bytes()
+
+        res = self.client.get(url, HTTP_RANGE="bytes=10-109")
+        self.assertEqual(res.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(res["Content-Range"], f"bytes 10-109/{len(content)}")
+        self.assertEqual(b"".join(res.streaming_content), content[10:110])
+
+        res = self.client.get(url, HTTP_RANGE="bytes=-50")
+        self.assertEqual(b"".join(res.streaming_content), content[-50:])
+
+    def test_unsatisfiable_range_returns_416(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        res = self.client.get(url, HTTP_RANGE="bytes=100000000-")
+        self.assertEqual(res.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_range_is_ignored_when_if_range_does_not_match(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        res = self.client.get(url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+
+    @override_settings(
+        RENDITION_SENDFILE="x-accel-redirect", RENDITION_SENDFILE_URL="/protected/"
+    )
+    def test_original_can_be_sent_with_x_accel_redirect(self):
+        image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.get(name="Original"), image=self.image
+        )
+        res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertEqual(res["X-Accel-Redirect"], f"/protected/{self.image.image.name}")
+        self.assertEqual(res.content, b"")
+
+    @override_settings(RENDITION_SENDFILE="x-sendfile", RENDITION_CACHE_MAX_SIZE=0)
+    def test_stored_rendition_can_be_sent_with_x_sendfile(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        self.client.get(url)
+        res = self.client.get(url)
+        self.assertEqual(
+            res["X-Sendfile"], self.image.image.storage.path(image_url.rendition_path)
+        )
+
     def test_caching_works(self):
         image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
         url = reverse("image-url-view", args=[image_url.id])
         self._test_log_message(url, "Cache miss")
         self._test_log_message(url, "Cache hit")
 
+    def test_rendition_is_cached_as_raw_bytes(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        cached = rendition_cache.get(image_url.rendition_key)
+        self.assertIsInstance(cached, bytes)
+        self.assertEqual(b"".join(res.streaming_content), cached)
+
+    def test_links_to_same_rendition_share_cache(self):
+        first_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        second_url = ImageUrl.objects.create(
+            preset=self.preset, image=self.image, expire=300
+        )
+        self.assertEqual(first_url.rendition_key, second_url.rendition_key)
+        self._test_log_message(
+            reverse("image-url-view", args=[first_url.id]), "Cache miss"
+        )
+        self._test_log_message(
+            reverse("image-url-view", args=[second_url.id]), "Cache hit"
+        )
+
+    def test_rendition_key_depends_on_preset(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        other_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.last(), image=self.image
+        )
+        self.assertNotEqual(image_url.rendition_key, other_url.rendition_key)
+
+    def test_renditions_survive_cache_flush(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        self._test_log_message(url, "Cache miss")
+        rendition_cache.clear()
+        self._test_log_message(url, "Storage hit")
+        self._test_log_message(url, "Cache hit")
+
+    @override_settings(RENDITION_CACHE_MAX_SIZE=0)
+    def test_large_renditions_are_not_cached(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        self._test_log_message(url, "Cache miss")
+        self.assertFalse(rendition_cache.has_key(image_url.rendition_key))
+        self._test_log_message(url, "Storage hit")
+        self._test_log_message(url, "Storage hit")
+
     def test_returns_404_when_cache_expires(self):
         image_url = ImageUrl.objects.create(
             preset=self.preset, image=self.image, expire=3
@@ -72,6 +319,148 @@ class TestImageUrlView(TestCase):
             logs = "".join(cm.output)
             self.assertIn(msg, logs)
 
+    def test_saturated_render_queue_returns_503(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        with patch(
+            "images.executor.RenderExecutor.submit", side_effect=RenderQueueFull(7)
+        ):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "7")
+
+        rendition_cache.set(image_url.rendition_key, b"rendition")
+        with patch(
+            "images.executor.RenderExecutor.submit", side_effect=RenderQueueFull(7)
+        ):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+    def test_images_past_the_pixel_budget_are_not_rendered(self):
+        plan = Plan.objects.create(name="Small", max_image_pixels=1_000_000)
+        User.objects.filter(pk=self.image.user_id).update(plan=plan)
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        self.assertEqual(res.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+        self.assertIn(b"1920x1920", res.content)
+        self.assertFalse(rendition_cache.has_key(image_url.rendition_key))
+
+        with override_settings(IMAGE_MAX_PIXELS=1_000_000):
+            plan.max_image_pixels = None
+            plan.save()
+            res = self.client.get(reverse("image-url-view", args=[image_url.id]))
+        self.assertEqual(res.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+
+    @override_settings(RENDITION_LOCAL_CACHE_SIZE=0)
+    def test_truncated_images_are_not_rendered(self):
+        content = image_path.read_bytes()
+        truncated = UploadedImage.objects.create(
+            image=SimpleUploadedFile("cut.png", content[: len(content) // 3]),
+            user=self.image.user,
+        )
+        image_url = ImageUrl.objects.create(preset=self.preset, image=truncated)
+        url = reverse("image-url-view", args=[image_url.id])
+        with patch(
+            "images.rendering.render_timed", wraps=rendering.render_timed
+        ) as render_timed, patch.object(
+            rendition_cache, "cache", BytesSerializingCache(rendition_cache.cache)
+        ):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+            self.assertTrue(res.content.startswith(b"The image could not be decoded"))
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+        self.assertTrue(res.content.startswith(b"The image could not be decoded"))
+        render_timed.assert_called_once()
+
+    def test_render_stats_are_admin_only(self):
+        url = reverse("render-stats")
+        self.client.force_login(User.objects.create_user(username="someone"))
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.FORBIDDEN)
+
+        self.client.force_login(
+            User.objects.create_user(username="staff_user", is_staff=True)
+        )
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertIn("queued", res.json())
+
+    def test_cached_link_is_served_without_queries(self):
+        image_url = ImageUrl.objects.create(
+            preset=self.preset, image=self.image, expire=300
+        )
+        url = reverse("image-url-view", args=[image_url.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        ImageUrl.objects.filter(pk=image_url.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        invalidate_links([image_url.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_local_tier_follows_link_changes(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        self.client.get(url)
+        with patch("images.links.link_cache.cache.get") as shared_get:
+            res = self.client.get(url)
+        shared_get.assert_not_called()
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+
+        image_url.delete()
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_unknown_links_are_cached(self):
+        url = reverse("image-url-view", args=[uuid.uuid4()])
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(reverse("image-url-view", args=["not-a-uuid"]))
+        self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_link_cache_follows_changes(self):
+        image_url = ImageUrl.objects.create(preset=self.preset, image=self.image)
+        url = reverse("image-url-view", args=[image_url.id])
+        etag = self.client.get(url)["ETag"]
+
+        self.preset.height = 50
+        self.preset.save()
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+        image_url.delete()
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_preset_edits_invalidate_one_entry(self):
+        image_urls = [
+            ImageUrl.objects.create(preset=self.preset, image=self.image)
+            for _ in range(3)
+        ]
+        for image_url in image_urls:
+            self.client.get(reverse("image-url-view", args=[image_url.id]))
+
+        with patch("images.links.link_cache.delete_many") as delete_many, patch(
+            "images.links.link_cache.delete", wraps=link_cache.delete
+        ) as delete:
+            self.preset.name = "renamed"
+            self.preset.save()
+        delete_many.assert_not_called()
+        delete.assert_called_once_with(f"link-imagepreset:{self.preset.pk}")
+        for image_url in image_urls:
+            self.assertTrue(link_cache.has_key(f"link:{image_url.pk}"))
+
+        with self.assertNumQueries(1):
+            obj = lookup_link(image_urls[0].pk)
+        self.assertEqual(obj.preset.name, "renamed")
+
     def test_expired_image_url_returns_404(self):
         image_url = ImageUrl.objects.create(
             preset=self.preset, image=self.image, expire=0
@@ -81,10 +470,95 @@ class TestImageUrlView(TestCase):
         self.assertEqual(res.status_code, HTTPStatus.NOT_FOUND)
 
 
-class TestUploadedImageViewSet(TestCase):
+class TestAsyncImageUrlView(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.image = UploadedImage.objects.create(
+            image=sample_image, user=User.objects.first()
+        )
+        self.image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.first(), image=self.image
+        )
+        self.factory = AsyncRequestFactory()
+        self.view = AsyncImageUrlView.as_view()
+        rendition_cache.clear()
+
+    async def test_cache_miss_renders_and_caches(self):
+        request = self.factory.get("/")
+        res = await self.view(request, pk=self.image_url.pk)
+        self.assertEqual(res.status_code, HTTPStatus.OK)
+        self.assertIn("ETag", res)
+        cached = rendition_cache.get(self.image_url.rendition_key)
+        self.assertEqual(b"".join(res.streaming_content), cached)
+
+    async def test_cache_hit_does_not_render(self):
+        rendition_cache.set(self.image_url.rendition_key, b"rendition")
+        with patch("images.views.render_missing_rendition") as render:
+            res = await self.view(self.factory.get("/"), pk=self.image_url.pk)
+        render.assert_not_called()
+        self.assertEqual(b"".join(res.streaming_content), b"rendition")
+
+    async def test_matching_etag_returns_not_modified(self):
+        res = await self.view(self.factory.get("/"), pk=self.image_url.pk)
+        request = self.factory.get("/", **{"If-None-Match": res["ETag"]})
+        res = await self.view(request, pk=self.image_url.pk)
+        self.assertEqual(res.status_code, HTTPStatus.NOT_MODIFIED)
+
+    async def test_non_get_requests_are_not_allowed(self):
+        res = await self.view(self.factory.post("/"), pk=self.image_url.pk)
+        self.assertEqual(res.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    async def test_expired_image_url_raises_404(self):
+        self.image_url.expire = 0
+        await sync_to_async(self.image_url.save)()
+        with self.assertRaises(Http404):
+            await self.view(self.factory.get("/"), pk=self.image_url.pk)
+
+
+class TestImageUrlViewConcurrency(TemporaryMediaMixin, TransactionTestCase):
     fixtures = ["fixtures/initial_data.json"]
 
     def setUp(self):
+        super().setUp()
+        self.image = UploadedImage.objects.create(
+            image=sample_image, user=User.objects.first()
+        )
+        rendition_cache.clear()
+
+    def test_concurrent_misses_render_once(self):
+        image_url = ImageUrl.objects.create(
+            preset=ImagePreset.objects.first(), image=self.image
+        )
+        url = reverse("image-url-view", args=[image_url.id])
+        render = rendering.render_timed
+
+        def slow_render(*args, **kwargs):
+            time.sleep(0.2)
+            return render(*args, **kwargs)
+
+        def fetch(_):
+            try:
+                res = Client().get(url)
+                return res.status_code, b"".join(res.streaming_content)
+            finally:
+                connection.close()
+
+        with patch("images.rendering.render_timed", side_effect=slow_render) as mock:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                responses = list(executor.map(fetch, range(8)))
+
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual({status for status, _ in responses}, {HTTPStatus.OK})
+        self.assertEqual(len({content for _, content in responses}), 1)
+
+
+class TestUploadedImageViewSet(TemporaryMediaMixin, TestCase):
+    fixtures = ["fixtures/initial_data.json"]
+
+    def setUp(self):
+        super().setUp()
         self.basic_user = User.objects.create_user(
             username="basic_user", plan=Plan.objects.get(name="Basic")
         )
@@ -98,11 +572,107 @@ class TestUploadedImageViewSet(TestCase):
         self.assertEqual(res.status_code, HTTPStatus.CREATED)
         self.assertIn("image_links", res.json())
 
+    def test_upload_records_image_metadata(self):
+        with patch("PIL.Image.Image.verify") as verify:
+            res = self._upload_file()
+        verify.assert_not_called()
+        image = UploadedImage.objects.get(id=res.json()["id"])
+        self.assertEqual((image.width, image.height), (1920, 1920))
+        self.assertEqual(image.format, "PNG")
+        self.assertEqual(image.file_size, image_path.stat().st_size)
+
+    def test_multi_picture_jpegs_are_served_as_jpeg(self):
+        self.client.force_login(self.enterprise_user)
+        img_data = BytesIO()
+        Image.new("RGB", (640, 480), "red").save(
+            img_data, "MPO", save_all=True, append_images=[Image.new("RGB", (640, 480))]
+        )
+        res = self.client.post(
+            reverse("images-list"),
+            {"image": SimpleUploadedFile("cam.jpg", img_data.getvalue())},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        image = UploadedImage.objects.get(id=res.json()["id"])
+        self.assertEqual((image.format, image.mime_type), ("JPEG", "image/jpeg"))
+        for image_links in res.json()["image_links"].values():
+            res = self.client.get(image_links[0]["url"])
+            self.assertEqual(res.status_code, HTTPStatus.OK)
+            self.assertEqual(res["Content-Type"], "image/jpeg")
+            body = b"".join(res.streaming_content) if res.streaming else res.content
+            with Image.open(BytesIO(body)) as rendition:
+                self.assertIn(rendition.format, {"JPEG", "MPO"})
+
+    def test_upload_rejects_non_images(self):
+        res = self.client.post(
+            reverse("images-list"),
+            {"image": SimpleUploadedFile("notes.png", b"not an image")},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("image", res.json())
+
     def test_user_can_list_images(self):
         self._upload_file()
         self._upload_file()
         res = self.client.get(reverse("images-list"))
-        self.assertEqual(len(res.json()), 2)
+        self.assertEqual(len(res.json()["results"]), 2)
+
+    def test_list_paginates_with_cursor(self):
+        for _ in range(3):
+            self._upload_file()
+        res = self.client.get(reverse("images-list"), {"page_size": 2})
+        self.assertEqual(len(res.json()["results"]), 2)
+        res = self.client.get(res.json()["next"])
+        self.assertEqual(len(res.json()["results"]), 1)
+        self.assertIsNone(res.json()["next"])
+
+    def test_list_pagination_handles_identical_timestamps(self):
+        for _ in range(3):
+            self._upload_file()
+        UploadedImage.objects.update(created_at=timezone.now())
+        res = self.client.get(reverse("images-list"), {"page_size": 2})
+        ids = [image["id"] for image in res.json()["results"]]
+        res = self.client.get(res.json()["next"])
+        ids += [image["id"] for image in res.json()["results"]]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_list_returns_only_requested_fields(self):
+        self._upload_file()
+        res = self.client.get(reverse("images-list"), {"fields": "id"})
+        self.assertEqual(list(res.json()["results"][0]), ["id"])
+
+    def test_list_filters_links_by_preset(self):
+        self.client.force_login(self.enterprise_user)
+        self._upload_file()
+        res = self.client.get(reverse("images-list"), {"presets": "Original"})
+        self.assertEqual(list(res.json()["results"][0]["image_links"]), ["Original"])
+
+    def test_list_can_omit_expired_links(self):
+        self.client.force_login(self.enterprise_user)
+        self._upload_file(extra_request_kwargs={"expire": 300})
+        image_url = ImageUrl.objects.first()
+        self.assertAlmostEqual(
+            image_url.expires_at,
+            image_url.created_at + timedelta(seconds=300),
+            delta=timedelta(seconds=1),
+        )
+        ImageUrl.objects.update(expires_at=timezone.now() - timedelta(seconds=300))
+        res = self.client.get(reverse("images-list"))
+        self.assertTrue(res.json()["results"][0]["image_links"])
+        res = self.client.get(reverse("images-list"), {"omit_expired": "true"})
+        self.assertEqual(res.json()["results"][0]["image_links"], {})
+
+    def test_list_query_count_does_not_grow_with_images(self):
+        self.client.force_login(self.enterprise_user)
+        self._upload_file()
+        with CaptureQueriesContext(connection) as few_images:
+            self.client.get(reverse("images-list"))
+        for _ in range(3):
+            self._upload_file(extra_request_kwargs={"expire": 300})
+        with CaptureQueriesContext(connection) as many_images:
+            res = self.client.get(reverse("images-list"))
+        self.assertEqual(len(res.json()["results"]), 4)
+        self.assertEqual(len(many_images), len(few_images))
 
     def test_user_can_create_more_image_urls(self):
         self.client.force_login(self.enterprise_user)
@@ -134,6 +704,207 @@ class TestUploadedImageViewSet(TestCase):
         res = self._upload_file()
         self.assertEqual(res.status_code, HTTPStatus.TOO_MANY_REQUESTS)
 
+    def test_upload_rejects_images_past_the_plan_pixel_budget(self):
+        Plan.objects.filter(name="Basic").update(max_image_pixels=1_000_000)
+        res = self._upload_file()
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(
+            res.json()["image"],
+            ["Images can have at most 1000000 pixels, this one has 3686400."],
+        )
+        self.assertFalse(UploadedImage.objects.exists())
+
+    @override_settings(IMAGE_MAX_SIZE=1024)
+    def test_upload_rejects_images_past_the_byte_budget(self):
+        res = self._upload_file()
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("Images can be at most 1.0\xa0KB", res.json()["image"][0])
+
+    def test_upload_rejects_decompression_bombs(self):
+        img_data = BytesIO()
+        Image.new("1", (20000, 20000)).save(img_data, "png")
+        res = self.client.post(
+            reverse("images-list"),
+            {"image": SimpleUploadedFile("bomb.png", img_data.getvalue())},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(res.json()["image"], ["This image has too many pixels."])
+
+    def test_bulk_upload_reports_images_past_the_pixel_budget(self):
+        Plan.objects.filter(name="Basic").update(max_image_pixels=1_000_000)
+        with open(image_path, "rb") as img:
+            res = self.client.post(reverse("images-bulk"), {"images": [img]})
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        [result] = res.json()["results"]
+        self.assertIn("1000000 pixels", result["errors"][0])
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_user_can_bulk_upload_images(self):
+        with open(image_path, "rb") as first, open(image_path, "rb") as second:
+            res = self.client.post(reverse("images-bulk"), {"images": [first, second]})
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        results = res.json()["results"]
+        self.assertEqual(len(results), 2)
+        self.assertEqual(
+            {result["id"] for result in results},
+            set(UploadedImage.objects.values_list("id", flat=True)),
+        )
+        self.assertEqual(ImageUrl.objects.count(), 2)
+        self.assertIn("thumbnail_200px_height", results[0]["image_links"])
+        self.assertEqual(
+            set(UploadedImage.objects.values_list("width", "height", "format")),
+            {(1920, 1920, "PNG")},
+        )
+
+    def test_bulk_upload_reports_invalid_items(self):
+        not_an_image = SimpleUploadedFile("notes.txt", b"not an image")
+        with open(image_path, "rb") as img:
+            res = self.client.post(
+                reverse("images-bulk"), {"images": [img, not_an_image]}
+            )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        valid, invalid = res.json()["results"]
+        self.assertIn("id", valid)
+        self.assertEqual(invalid["name"], "notes.txt")
+        self.assertIn("errors", invalid)
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_bulk_upload_accepts_zip_archive(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.write(image_path, "gallery/one.png")
+            zip_file.write(image_path, "gallery/two.png")
+        res = self.client.post(
+            reverse("images-bulk"),
+            {"archive": SimpleUploadedFile("gallery.zip", archive.getvalue())},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        self.assertEqual(
+            [result["name"] for result in res.json()["results"]],
+            ["one.png", "two.png"],
+        )
+        self.assertEqual(UploadedImage.objects.count(), 2)
+
+    def test_bulk_upload_accepts_tar_archive(self):
+        archive = BytesIO()
+        with tarfile.open(fileobj=archive, mode="w:gz") as tar_file:
+            tar_file.add(image_path, "one.png")
+        res = self.client.post(
+            reverse("images-bulk"),
+            {"archive": SimpleUploadedFile("gallery.tar.gz", archive.getvalue())},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=3)
+    def test_bulk_upload_rejects_too_many_images_before_storing_any(self):
+        files = [open(image_path, "rb") for _ in range(5)]
+        for file in files:
+            self.addCleanup(file.close)
+        with patch("images.bulk.BulkUploader.batch_size", 2):
+            res = self.client.post(reverse("images-bulk"), {"images": files})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("images", res.json())
+        self.assertFalse(UploadedImage.objects.exists())
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=3)
+    def test_bulk_upload_skips_archive_files_past_the_limit(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for index in range(5):
+                zip_file.write(image_path, f"{index}.png")
+        with patch("images.bulk.BulkUploader.batch_size", 2):
+            res = self.client.post(
+                reverse("images-bulk"),
+                {"archive": SimpleUploadedFile("gallery.zip", archive.getvalue())},
+            )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        results = res.json()["results"]
+        self.assertEqual(
+            [result["name"] for result in results], [f"{i}.png" for i in range(4)]
+        )
+        self.assertIn("at most 3 files", results[3]["errors"][0])
+        self.assertEqual(
+            {result["id"] for result in results[:3]},
+            set(UploadedImage.objects.values_list("id", flat=True)),
+        )
+
+    def test_bulk_upload_reports_archives_that_break_off(self):
+        archive = BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar_file:
+            tar_file.add(image_path, "one.png")
+            tar_file.add(image_path, "two.png")
+        content = archive.getvalue()
+        with patch("images.bulk.BulkUploader.batch_size", 1):
+            res = self.client.post(
+                reverse("images-bulk"),
+                # Cut inside the second member.
+                {
+                    "archive": SimpleUploadedFile(
+                        "gallery.tar", content[: len(content) // 2]
+                    )
+                },
+            )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        stored, broken = res.json()["results"]
+        self.assertEqual(stored["id"], UploadedImage.objects.get().id)
+        self.assertEqual(broken["name"], "gallery.tar")
+        self.assertEqual(broken["errors"], ["Upload a valid zip or tar archive."])
+
+    def test_bulk_upload_reports_corrupt_zip_members(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.write(image_path, "one.png")
+            zip_file.write(image_path, "two.png")
+            second = zip_file.getinfo("two.png")
+        content = bytearray(archive.getvalue())
+        # Garble the start of the second member's deflate stream.
+        start = second.header_offset + 30 + len("two.png")
+        end = start + 64
+        content[start:end] = b"\xff" * 64
+        with patch("images.bulk.BulkUploader.batch_size", 1):
+            res = self.client.post(
+                reverse("images-bulk"),
+                {"archive": SimpleUploadedFile("gallery.zip", bytes(content))},
+            )
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        stored, broken = res.json()["results"]
+        self.assertEqual(stored["id"], UploadedImage.objects.get().id)
+        self.assertEqual(broken["name"], "gallery.zip")
+        self.assertEqual(broken["errors"], ["Upload a valid zip or tar archive."])
+
+    def test_bulk_upload_does_not_spool_archive_files_past_the_byte_budget(self):
+        Plan.objects.filter(name="Basic").update(max_image_size=1024)
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr("zeros.png", bytes(10 * 1024 * 1024))
+        with patch("images.bulk.copy_at_most") as copy_at_most:
+            res = self.client.post(
+                reverse("images-bulk"),
+                {"archive": SimpleUploadedFile("gallery.zip", archive.getvalue())},
+            )
+        copy_at_most.assert_not_called()
+        self.assertEqual(res.status_code, HTTPStatus.CREATED)
+        [result] = res.json()["results"]
+        self.assertIn("Images can be at most 1.0\xa0KB", result["errors"][0])
+
+    def test_spooling_stops_past_the_byte_budget(self):
+        # The member's header claims 10 bytes, its content has more.
+        upload = spool(BytesIO(bytes(5000)), "dir/liar.png", 10, 1024)
+        self.assertEqual((upload.name, upload.size), ("liar.png", 1025))
+        self.assertEqual(len(upload.read()), 1025)
+
+    def test_bulk_upload_rejects_invalid_archive(self):
+        res = self.client.post(
+            reverse("images-bulk"),
+            {"archive": SimpleUploadedFile("gallery.zip", b"garbage")},
+        )
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_bulk_upload_requires_files(self):
+        res = self.client.post(reverse("images-bulk"), {})
+        self.assertEqual(res.status_code, HTTPStatus.BAD_REQUEST)
+
     def _upload_file(self, filepath=image_path, extra_request_kwargs={}):
         with open(filepath, "rb") as img:
             res = self.client.post(
@@ -0,0 +1,30 @@
+import shutil
+import tempfile
+
+from common.cache import BytesSerializer
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.test import override_settings
+
+
+class TemporaryMediaMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+
+class BytesSerializingCache:
+    """Wraps a cache to pass values through ``BytesSerializer`` like Redis does."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.serializer = BytesSerializer({})
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.cache.set(key, self.serializer.dumps(value), timeout)
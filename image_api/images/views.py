@@ -1,53 +1,263 @@
-import logging
-from io import BytesIO
+import asyncio
+import hashlib
+import uuid
+from calendar import timegm
 
-from django.core.cache import cache
-from django.http import FileResponse, Http404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.decorators import classonlymethod
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_GET
 from django.views.generic import View
 from django.views.generic.detail import SingleObjectMixin
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
+from . import metrics, rendering
+from .executor import RenderQueueFull, get_render_executor
+from .links import link_cache, lookup_link
 from .models import ImageUrl, UploadedImage
-from .serializers import ExpireOnlySerializer, UploadedImageSerializer
+from .pagination import UploadedImagePagination
+from .renditions import (
+    find_rendition,
+    get_rendition,
+    max_render_pixels,
+    render_missing_rendition,
+    rendition_cache,
+)
+from .responses import accepted_types, file_response
+from .serializers import (
+    BulkUploadSerializer,
+    ExpireOnlySerializer,
+    UploadedImageSerializer,
+)
 
 
 class UploadedImageViewSet(viewsets.ModelViewSet):
     serializer_class = UploadedImageSerializer
+    pagination_class = UploadedImagePagination
 
     def get_queryset(self):
         user = self.request.user
-        return UploadedImage.objects.filter(user=user)
+        image_urls = ImageUrl.objects.select_related("preset")
+        presets = self.get_query_list("presets")
+        if presets:
+            image_urls = image_urls.filter(preset__name__in=presets)
+        if self.request.query_params.get("omit_expired", "").lower() in ["1", "true"]:
+            image_urls = image_urls.active()
+        return UploadedImage.objects.filter(user=user).prefetch_related(
+            Prefetch("imageurl_set", queryset=image_urls)
+        )
+
+    def get_query_list(self, name):
+        values = self.request.query_params.get(name, "")
+        return [value for value in values.split(",") if value]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ["list", "retrieve"]:
+            context["fields"] = self.get_query_list("fields")
+        return context
 
     def get_serializer_class(self):
         if self.action in ["update", "partial_update"]:
             return ExpireOnlySerializer
+        if self.action == "bulk":
+            return BulkUploadSerializer
         return super().get_serializer_class()
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        return Response({"results": results}, status=status.HTTP_201_CREATED)
+
 
 class ImageUrlView(View, SingleObjectMixin):
     model = ImageUrl
-    http_method_names = ["get"]
+    http_method_names = ["get", "head"]
+    # Renditions never change under a given ETag, so links without an
+    # expiry can be cached for as long as clients are willing to.
+    immutable_max_age = 365 * 24 * 60 * 60
 
     def get_object(self, queryset=None):
-        obj = super().get_object(queryset=queryset)
+        try:
+            pk = uuid.UUID(str(self.kwargs[self.pk_url_kwarg]))
+        except ValueError:
+            raise Http404("Link not found.")
+        with metrics.timer("image_link_lookup_seconds", "link"):
+            obj = lookup_link(pk)
+        if obj is None:
+            raise Http404("Link not found.")
         if obj.expired:
             raise Http404("Link is expired.")
         return obj
 
-    def get(self, request, *args, **kwargs):
-        obj = self.get_object()
-        cache_key = obj.id
-        img_data = cache.get(cache_key)
-        if img_data:
-            logging.debug("Cache hit")
+    def get_etag(self, obj):
+        return quote_etag(hashlib.sha256(obj.rendition_key.encode()).hexdigest())
+
+    def get_last_modified(self, obj):
+        # updated_at moves when the image's file is replaced.
+        last_modified = max(obj.image.updated_at, obj.preset.updated_at)
+        return timegm(last_modified.utctimetuple())
+
+    def is_negotiated(self, obj):
+        return bool(settings.RENDITION_FORMATS) and not obj.image.rendition_is_original(
+            obj.preset
+        )
+
+    def negotiate_filetype(self, obj):
+        """Return the first of RENDITION_FORMATS the client accepts.
+
+        Falls back to the original's format, which originals are always
+        served in.
+        """
+        if self.is_negotiated(obj):
+            accepted = accepted_types(self.request.META.get("HTTP_ACCEPT", ""))
+            for filetype in settings.RENDITION_FORMATS:
+                if f"image/{filetype}" in accepted and rendering.can_encode(filetype):
+                    return filetype
+        return obj.image.filetype
+
+    def patch_cache_headers(self, response, obj, etag, last_modified):
+        if self.is_negotiated(obj):
+            patch_vary_headers(response, ["Accept"])
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        if obj.expire is None:
+            patch_cache_control(
+                response, public=True, max_age=self.immutable_max_age, immutable=True
+            )
         else:
-            logging.debug("Cache miss")
-            img = obj.apply_preset()
-            img_data = BytesIO()
-            img.save(img_data, obj.image.filetype)
-            img_data.seek(0)
-            cache.set(cache_key, img_data, obj.expire_in)
-        response = FileResponse(
-            img_data, filename=f"{obj.preset.name}_{obj.image.filename}"
+            patch_cache_control(response, public=True, max_age=obj.expire_in)
+
+    def get_link(self):
+        obj = self.get_object()
+        obj.filetype = self.negotiate_filetype(obj)
+        return obj, self.get_etag(obj), self.get_last_modified(obj)
+
+    def rendition_response(self, request, obj, img_data, etag):
+        return file_response(
+            request,
+            img_data,
+            filename=obj.filename,
+            content_type=obj.mime_type or None,
+            etag=etag,
+        )
+
+    def queue_full_response(self, exc):
+        metrics.increment("rendition_renders_total", (("result", "rejected"),))
+        response = HttpResponse(
+            "Too many images are being rendered, retry later.",
+            content_type="text/plain",
+            status=503,
         )
+        response["Retry-After"] = exc.retry_after
         return response
+
+    def too_large_response(self, exc):
+        metrics.increment("rendition_renders_total", (("result", "too_large"),))
+        return HttpResponse(str(exc), content_type="text/plain", status=422)
+
+    def unreadable_response(self, exc):
+        metrics.increment("rendition_renders_total", (("result", "unreadable"),))
+        return HttpResponse(str(exc), content_type="text/plain", status=422)
+
+    def get(self, request, *args, **kwargs):
+        obj, etag, last_modified = self.get_link()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            try:
+                img_data = get_rendition(obj)
+            except RenderQueueFull as exc:
+                return self.queue_full_response(exc)
+            except rendering.ImageTooLarge as exc:
+                return self.too_large_response(exc)
+            except rendering.UnreadableImage as exc:
+                return self.unreadable_response(exc)
+            response = self.rendition_response(request, obj, img_data, etag)
+        self.patch_cache_headers(response, obj, etag, last_modified)
+        return response
+
+
+class AsyncImageUrlView(ImageUrlView):
+    """``ImageUrlView`` for ASGI deployments.
+
+    The link lookup, cache read and render run in threads, so the event loop
+    is free to keep streaming other responses while a rendition is produced.
+    """
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Django 3.2 only awaits views that look like coroutine functions.
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        obj, etag, last_modified = await sync_to_async(self.get_link)()
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            img_data = await sync_to_async(find_rendition, thread_sensitive=False)(obj)
+            if img_data is None:
+                # Read on the thread the ORM is confined to, not the render's.
+                max_pixels = await sync_to_async(max_render_pixels)(obj.image)
+                try:
+                    img_data = await sync_to_async(
+                        render_missing_rendition, thread_sensitive=False
+                    )(obj, max_pixels)
+                except RenderQueueFull as exc:
+                    return self.queue_full_response(exc)
+                except rendering.ImageTooLarge as exc:
+                    return self.too_large_response(exc)
+                except rendering.UnreadableImage as exc:
+                    return self.unreadable_response(exc)
+            response = self.rendition_response(request, obj, img_data, etag)
+        self.patch_cache_headers(response, obj, etag, last_modified)
+        return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def render_stats(request):
+    """Queue depth and render latency totals of this process's render pool."""
+    return Response(get_render_executor().stats())
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus metrics of this process."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    stats = get_render_executor().stats()
+    gauges = [
+        (f"render_pool_{name}", (), stats[name])
+        for name in ["workers", "running", "queued"]
+    ]
+    for cache_name, tiered_cache in [
+        ("renditions", rendition_cache),
+        ("links", link_cache),
+    ]:
+        for name, value in tiered_cache.local.stats().items():
+            gauges.append((f"local_cache_{name}", (("cache", cache_name),), value))
+    return HttpResponse(
+        metrics.registry.exposition(gauges),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )